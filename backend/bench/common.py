@@ -0,0 +1,28 @@
+"""
+Общая подготовка бенчмарков: окружение задается до импорта приложения
+(движки БД создаются при импорте), база — временный файл SQLite.
+Запуск из корня репозитория: python -m backend.bench.<имя>
+"""
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+BENCH_DIR = tempfile.mkdtemp(prefix="fruitshop-bench-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(BENCH_DIR, "bench.db")
+os.environ.setdefault("EXPIRATION_JOB_INTERVAL_SECONDS", "0")
+
+
+class Timer:
+    """Секундомер для with: elapsed — прошедшее время в секундах."""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+
+
+def report(name: str, value: float, unit: str) -> None:
+    print(f"{name:40s} {value:12.1f} {unit}")
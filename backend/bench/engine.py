@@ -0,0 +1,63 @@
+"""
+Пропускная способность движка БД на файловой SQLite: прежний движок
+(echo=True, NullPool aiosqlite — новое соединение на каждую сессию, без PRAGMA)
+против create_engine с настройками Config (пул, WAL, synchronous=NORMAL,
+mmap/cache, логирование выключено). Нагрузка — короткие сессии, три чтения
+по первичному ключу на одну вставку, CONCURRENCY сессий одновременно.
+"""
+import asyncio
+import contextlib
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.bench.common import BENCH_DIR, Timer, report
+from backend.src import models
+from backend.src.utils.db import Base, create_engine
+
+SESSIONS = 2000
+CONCURRENCY = 10
+SEED_ROWS = 100
+
+
+async def _throughput(engine) -> float:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessions() as db:
+        db.add_all(models.Category(name_category=f"Категория {i}") for i in range(SEED_ROWS))
+        await db.commit()
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def session(i: int) -> None:
+        async with semaphore, sessions() as db:
+            if i % 4 == 3:
+                db.add(models.Category(name_category=f"Новая {i}"))
+                await db.commit()
+            else:
+                await db.get(models.Category, i % SEED_ROWS + 1)
+
+    with Timer() as timer:
+        await asyncio.gather(*(session(i) for i in range(SESSIONS)))
+    await engine.dispose()
+    return SESSIONS / timer.elapsed
+
+
+async def _main() -> None:
+    # Отдельные файлы: режим WAL сохраняется в файле и повлиял бы на прежний движок
+    new_url = "sqlite:///" + os.path.join(BENCH_DIR, "engine-new.db")
+    old_url = "sqlite+aiosqlite:///" + os.path.join(BENCH_DIR, "engine-old.db")
+
+    report("create_engine (Config)", await _throughput(create_engine(new_url)), "сессий/с")
+    # Лог SQL уходит в /dev/null: измеряется его форматирование, а не скорость терминала
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            old_engine = create_async_engine(old_url, echo=True)
+        report("create_async_engine(echo=True)", await _throughput(old_engine), "сессий/с")
+
+
+if __name__ == "__main__":
+    # python -m backend.bench.engine
+    asyncio.run(_main())
@@ -0,0 +1,73 @@
+"""
+Строк в секунду по спискам API: страницы по PAGE_SIZE строк через TestClient,
+включая разбор запроса, SQL, сборку моделей из строк и кодирование JSON.
+Каталог измеряется с очищенным снимком, чтобы каждая страница шла в БД.
+"""
+import datetime
+
+from fastapi.testclient import TestClient
+
+from backend.bench.common import Timer, report
+from backend.src import app, models, schemas
+from backend.src.utils.db import AsyncSessionLocal
+from backend.src.utils.security import create_access_token
+from backend.src.utils.snapshot import catalog_snapshot
+
+ROWS = 2000
+PAGE_SIZE = 100
+REQUESTS = 150
+
+ADMIN = {"Authorization": "Bearer " + create_access_token({"sub": "admin", "user_id": 1, "role": "admin"})}
+
+
+async def _seed() -> None:
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            models.User(username="admin", email="admin@example.com", hashed_password="-", role="admin"),
+            models.Category(name_category="Фрукты"),
+            models.Country(name_country="Испания"),
+        ])
+        await db.flush()
+        db.add_all(
+            models.Product(
+                name=f"Товар {i}", id_country=1, id_category=1, price_per_unit=10 + i % 50,
+                unit_type=schemas.UnitType.KG, expiration_date=datetime.date(2099, 1, 1)
+            )
+            for i in range(ROWS)
+        )
+        await db.flush()
+        started = datetime.datetime(2026, 1, 1)
+        for i in range(ROWS):
+            order = models.Order(id_user=1, total_amount=15, order_date=started + datetime.timedelta(minutes=i))
+            order.order_details = [
+                models.OrderDetail(id_product=j + 1, quantity=1, unit_type=schemas.UnitType.KG, price=5, amount=5)
+                for j in range(3)
+            ]
+            db.add(order)
+            db.add(models.Review(id_user=1, id_product=i + 1, rating=i % 5 + 1, comment="Отзыв " * 8))
+        await db.commit()
+
+
+def _rows_per_second(client: TestClient, path: str, cold_snapshot: bool = False) -> float:
+    client.get(path, headers=ADMIN)
+    with Timer() as timer:
+        for _ in range(REQUESTS):
+            if cold_snapshot:
+                catalog_snapshot.clear()
+            response = client.get(path, headers=ADMIN)
+            assert response.status_code == 200, response.text
+    return REQUESTS * PAGE_SIZE / timer.elapsed
+
+
+def _main() -> None:
+    with TestClient(app) as client:
+        client.portal.call(_seed)
+        report("/product/all (снимок очищен)", _rows_per_second(client, f"/product/all?limit={PAGE_SIZE}", True), "строк/с")
+        report("/orders/all", _rows_per_second(client, f"/orders/all?limit={PAGE_SIZE}"), "строк/с")
+        report("/orders/all?expand=items", _rows_per_second(client, f"/orders/all?limit={PAGE_SIZE}&expand=items"), "строк/с")
+        report("/review/all", _rows_per_second(client, f"/review/all?limit={PAGE_SIZE}"), "строк/с")
+
+
+if __name__ == "__main__":
+    # python -m backend.bench.serialization
+    _main()
@@ -0,0 +1,32 @@
+"""
+Накладные расходы аутентификации на запрос: decode_access_token с проверкой
+подписи python-jose на каждом вызове (кэш сбрасывается) и с прогретым кэшем.
+"""
+import asyncio
+
+from backend.bench.common import Timer, report
+from backend.src.utils import security
+
+CALLS = 20_000
+
+
+async def _decode(token: str, cold: bool) -> float:
+    with Timer() as timer:
+        for _ in range(CALLS):
+            if cold:
+                security._token_cache.clear()
+            await security.decode_access_token(token)
+    return timer.elapsed / CALLS * 1e6
+
+
+async def _main() -> None:
+    token = security.create_access_token({"sub": "bench", "user_id": 1, "role": "user"})
+    report("decode_access_token без кэша", await _decode(token, cold=True), "мкс/вызов")
+    security._token_cache.clear()
+    report("decode_access_token с кэшем", await _decode(token, cold=False), "мкс/вызов")
+    print(security.token_cache_stats())
+
+
+if __name__ == "__main__":
+    # python -m backend.bench.token_cache
+    asyncio.run(_main())
@@ -2,13 +2,25 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from backend.src.api import init_routes
-from backend.src.utils.db import Base, engine
+from backend.src.utils.db import Base, engine, read_engine
+from backend.src.utils.hashing import password_hasher
+from backend.src.utils.inventory import expiration_job
+from backend.src.utils.search import setup_search
+from backend.src.utils.serialization import FastJSONResponse
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await setup_search(conn)
+    # Первое соединение нового пула SQLAlchemy открывает под потоковой блокировкой:
+    # пачка одновременных запросов к холодному пулу читателя зависала бы на ней
+    async with read_engine.connect() as conn:
+        await conn.exec_driver_sql("SELECT 1")
+    expiration_job.start()
     yield
+    await expiration_job.stop()
+    password_hasher.shutdown()
 
 
 # Создаем экземпляр FastAPI
@@ -16,7 +28,8 @@ app = FastAPI(
     title="Fruit Shop API",
     description="API для управления фруктовой лавкой",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 origins = [
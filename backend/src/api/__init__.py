@@ -1,5 +1,5 @@
 from fastapi import FastAPI
-from backend.src.api import reviews, products, users, countries, categories, orders, cart
+from backend.src.api import reviews, products, users, countries, categories, orders, cart, metrics, analytics
 
 
 # Функция для регистрации всех маршрутов в приложении
@@ -10,4 +10,6 @@ def init_routes(app: FastAPI):
     app.include_router(orders.router)
     app.include_router(countries.router)
     app.include_router(categories.router)
-    app.include_router(reviews.router)
\ No newline at end of file
+    app.include_router(reviews.router)
+    app.include_router(metrics.router)
+    app.include_router(analytics.router)
\ No newline at end of file
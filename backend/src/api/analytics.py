@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from backend.src.utils.analytics import rebuild_rollups, sales_report
+from backend.src.utils.db import get_db, get_read_db
+from backend.src.utils.security import has_role
+from backend.src import schemas
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(has_role("admin"))],
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_403_FORBIDDEN: {"description": "Forbidden"}
+    },
+)
+
+@router.get("/sales", response_model=List[schemas.SalesBucket])
+async def get_sales(
+    group_by: schemas.SalesGroupEnum = schemas.SalesGroupEnum.DAY,
+    filters: schemas.SalesFilter = Depends(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await sales_report(db, group_by, filters)
+
+@router.get("/top-products", response_model=List[schemas.SalesBucket])
+async def get_top_products(
+    by: schemas.SalesMetricEnum = schemas.SalesMetricEnum.REVENUE,
+    limit: int = Query(10, ge=1, le=100),
+    filters: schemas.SalesFilter = Depends(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await sales_report(db, schemas.SalesGroupEnum.PRODUCT, filters, order_by=by, limit=limit)
+
+@router.post("/rebuild", status_code=status.HTTP_204_NO_CONTENT)
+async def rebuild_sales_rollups(
+    db: AsyncSession = Depends(get_db)
+):
+    await rebuild_rollups(db)
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import case, delete, literal, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List
 
 from backend.src import models, schemas
-from backend.src.utils.db import get_db
-from backend.src.utils.security import get_current_active_user
+from backend.src.utils.cache import MISSING
+from backend.src.utils.db import dialect_insert, get_db
+from backend.src.utils.inventory import orderable
+from backend.src.utils.security import CurrentUser, get_current_active_user
 
 router = APIRouter(
     prefix="/cart",
@@ -16,7 +20,7 @@ router = APIRouter(
 
 @router.get("", response_model=List[schemas.CartItem])
 async def read_user_cart(
-    current_user: models.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
@@ -30,39 +34,33 @@ async def read_user_cart(
 @router.post("/items", response_model=schemas.CartItem, status_code=status.HTTP_201_CREATED)
 async def add_product_to_cart(
     item_in: schemas.CartItemCreate,
-    current_user: models.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(
-        select(models.CartItem)
-        .where(models.CartItem.user_id == current_user.id, models.CartItem.product_id == item_in.product_id)
-        .options(selectinload(models.CartItem.product))
+    # Один атомарный UPSERT вместо SELECT -> INSERT/UPDATE: параллельные добавления
+    # одного товара не теряют количество и не конфликтуют на uq_user_product.
+    # INSERT ... SELECT из products не вставит строку, если товара нет.
+    new_quantity = models.CartItem.quantity + item_in.quantity
+    stmt = dialect_insert(db, models.CartItem).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(
+            literal(current_user.id),
+            models.Product.id_product,
+            literal(max(1, item_in.quantity))
+        ).where(models.Product.id_product == item_in.product_id, orderable())
     )
-    existing_item = result.scalars().first()
-
-    db_item: models.CartItem
-
-    if existing_item:
-        # Если товар уже есть, увеличиваем количество
-        new_quantity = existing_item.quantity + item_in.quantity
-        existing_item.quantity = max(1, new_quantity)
-        db_item = existing_item
-    else:
-        # Если товара нет, создаем новую запись
-        product_exists = await db.get(models.Product, item_in.product_id)
-        if not product_exists:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Товар с id {item_in.product_id} не найден")
-
-        db_item = models.CartItem(
-            user_id=current_user.id,
-            product_id=item_in.product_id,
-            quantity=max(1, item_in.quantity)
-        )
-        db.add(db_item)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "product_id"],
+        set_={"quantity": case((new_quantity < 1, 1), else_=new_quantity)}
+    ).returning(models.CartItem)
+    result = await db.execute(stmt, execution_options={"populate_existing": True})
+    db_item = result.scalars().first()
+
+    if not db_item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Товар с id {item_in.product_id} не найден или просрочен")
 
+    set_committed_value(db_item, "product", await db.get(models.Product, item_in.product_id))
     await db.commit()
-    await db.refresh(db_item)
-    await db.refresh(db_item, attribute_names=['product'])
     return db_item
 
 
@@ -70,60 +68,128 @@ async def add_product_to_cart(
 async def update_product_quantity_in_cart(
     product_id: int,
     quantity_update: schemas.CartItemUpdate,
-    current_user: models.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
-        select(models.CartItem)
+        update(models.CartItem)
         .where(models.CartItem.user_id == current_user.id, models.CartItem.product_id == product_id)
-        .options(selectinload(models.CartItem.product))
+        .values(quantity=max(1, quantity_update.quantity))
+        .returning(models.CartItem),
+        execution_options={"populate_existing": True}
     )
     db_item = result.scalars().first()
 
     if not db_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Товар не найден в корзине")
 
-    new_quantity = max(1, quantity_update.quantity)
-    db_item.quantity = new_quantity
-
+    set_committed_value(db_item, "product", await db.get(models.Product, product_id))
     await db.commit()
-    await db.refresh(db_item)
-    await db.refresh(db_item, attribute_names=['product'])
     return db_item
 
 
 @router.delete("/items/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_product_from_cart(
     product_id: int,
-    current_user: models.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
-        select(models.CartItem)
+        delete(models.CartItem)
         .where(models.CartItem.user_id == current_user.id, models.CartItem.product_id == product_id)
     )
-    db_item = result.scalars().first()
 
-    if not db_item:
+    if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Товар не найден в корзине")
 
-    await db.delete(db_item)
-
     await db.commit()
     return None
 
-@router.delete("", status_code=status.HTTP_204_NO_CONTENT)
-async def clear_user_cart_endpoint(
-    current_user: models.User = Depends(get_current_active_user),
+@router.patch("", response_model=List[schemas.CartItem])
+async def apply_cart_operations(
+    batch: schemas.CartBatch,
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
+    """
+    Применяет пакет операций set/increment/remove одной транзакцией.
+    Операции над одним товаром сворачиваются по порядку (increment'ы
+    суммируются), после чего выполняются один DELETE и один UPSERT.
+    """
+    # product_id -> None (удалить) | ("set", количество) | ("increment", приращение)
+    final_ops: dict[int, tuple[str, int] | None] = {}
+    for operation in batch.operations:
+        previous = final_ops.get(operation.product_id, MISSING)
+        if operation.op == schemas.CartOperationEnum.REMOVE:
+            final_ops[operation.product_id] = None
+        elif operation.op == schemas.CartOperationEnum.SET:
+            final_ops[operation.product_id] = ("set", max(1, operation.quantity))
+        elif previous is MISSING:
+            final_ops[operation.product_id] = ("increment", operation.quantity)
+        elif previous is None:
+            final_ops[operation.product_id] = ("set", max(1, operation.quantity))
+        else:
+            mode, value = previous
+            total = value + operation.quantity
+            final_ops[operation.product_id] = (mode, max(1, total) if mode == "set" else total)
+
+    to_remove = [product_id for product_id, op in final_ops.items() if op is None]
+    to_upsert = {product_id: op for product_id, op in final_ops.items() if op is not None}
+
+    if to_remove:
+        await db.execute(
+            delete(models.CartItem)
+            .where(models.CartItem.user_id == current_user.id, models.CartItem.product_id.in_(to_remove))
+        )
+
+    if to_upsert:
+        # Количество для новой строки и для существующей задается CASE по product_id
+        insert_quantity = case(
+            {product_id: max(1, value) for product_id, (_, value) in to_upsert.items()},
+            value=models.Product.id_product
+        )
+        new_quantities = {}
+        for product_id, (mode, value) in to_upsert.items():
+            if mode == "set":
+                new_quantities[product_id] = literal(value)
+            else:
+                summed = models.CartItem.quantity + value
+                new_quantities[product_id] = case((summed < 1, 1), else_=summed)
+        stmt = dialect_insert(db, models.CartItem).from_select(
+            ["user_id", "product_id", "quantity"],
+            select(literal(current_user.id), models.Product.id_product, insert_quantity)
+            .where(models.Product.id_product.in_(list(to_upsert)), orderable())
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "product_id"],
+            set_={"quantity": case(new_quantities, value=models.CartItem.product_id)}
+        ).returning(models.CartItem.product_id)
+        result = await db.execute(stmt)
+
+        missing = set(to_upsert) - set(result.scalars().all())
+        if missing:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Товары с id {sorted(missing)} не найдены или просрочены"
+            )
+
+    await db.commit()
+
     result = await db.execute(
-        select(models.CartItem).where(models.CartItem.user_id == current_user.id)
+        select(models.CartItem)
+        .where(models.CartItem.user_id == current_user.id)
+        .options(selectinload(models.CartItem.product))
     )
-    items_to_delete = result.scalars().all()
-    for item in items_to_delete:
-        await db.delete(item)
+    return result.scalars().all()
 
+@router.delete("", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_user_cart_endpoint(
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    await db.execute(
+        delete(models.CartItem).where(models.CartItem.user_id == current_user.id)
+    )
     await db.commit()
     return None
-
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 from typing import List
 
-from backend.src.utils.db import get_db
+from backend.src.utils.db import get_db, get_read_db
+from backend.src.utils import reference
+from backend.src.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from backend.src.utils.snapshot import catalog_response, catalog_snapshot
 from backend.src import models, schemas
 
 router = APIRouter(
@@ -18,40 +20,35 @@ router = APIRouter(
 
 @router.get("/all", response_model=List[schemas.Category])
 async def get_all_categories(
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(select(models.Category))
-    categories = result.scalars().all()
-    return categories
+    return await reference.get_categories(db)
 
 @router.get("/{id}", response_model=schemas.Category)
 async def get_category(
     id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(select(models.Category).filter(models.Category.id_category == id))
-    category = result.scalars().first()
+    category = await reference.get_category(db, id)
     if category is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Категория не найдена")
     return category
 
-@router.get("/{id}/products", response_model=List[schemas.Product])
+@router.get("/{id}/products", response_model=schemas.ProductPage)
 async def get_category_products(
     id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    filters: schemas.ProductFilter = Depends(),
+    sort: schemas.ProductSortEnum = schemas.ProductSortEnum.ID_ASC,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    category_result = await db.execute(select(models.Category).filter(models.Category.id_category == id))
-    if category_result.scalars().first() is None:
+    if await reference.get_category(db, id) is None:
          raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Категория не найдена")
 
-    result = await db.execute(
-        select(models.Product).options(
-            selectinload(models.Product.country),
-            selectinload(models.Product.category)
-        ).filter(models.Product.id_category == id)
-    )
-    products = result.scalars().all()
-    return products
+    filters.id_category = id
+    return await catalog_response(request, db, filters, sort, limit, cursor)
 
 
 @router.post("", response_model=schemas.Category, status_code=status.HTTP_201_CREATED)
@@ -63,6 +60,7 @@ async def add_category(
     db.add(db_category)
     await db.commit()
     await db.refresh(db_category)
+    reference.invalidate_category(db_category.id_category)
     return db_category
 
 @router.put("/{id}", response_model=schemas.Category)
@@ -82,6 +80,8 @@ async def update_category(
 
     await db.commit()
     await db.refresh(db_category)
+    reference.invalidate_category(db_category.id_category)
+    catalog_snapshot.invalidate_category(db_category.id_category)
     return db_category
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -96,4 +96,6 @@ async def delete_category(
 
     await db.delete(db_category)
     await db.commit()
+    reference.invalidate_category(id)
+    catalog_snapshot.invalidate_category(id)
     return {"message": "Категория удалена"}
\ No newline at end of file
@@ -3,8 +3,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 
-from backend.src.utils.security import has_role
-from backend.src.utils.db import get_db
+from backend.src.utils.security import CurrentUser, has_role
+from backend.src.utils.db import get_db, get_read_db
+from backend.src.utils import reference
+from backend.src.utils.snapshot import catalog_snapshot
 from backend.src import models, schemas
 
 router = APIRouter(
@@ -18,19 +20,16 @@ router = APIRouter(
 
 @router.get("/all", response_model=List[schemas.Country])
 async def get_all_countries(
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(select(models.Country))
-    countries = result.scalars().all()
-    return countries
+    return await reference.get_countries(db)
 
 @router.get("/{id}", response_model=schemas.Country)
 async def get_country(
     id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(select(models.Country).filter(models.Country.id_country == id))
-    country = result.scalars().first()
+    country = await reference.get_country(db, id)
     if country is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Страна не найдена")
     return country
@@ -38,20 +37,21 @@ async def get_country(
 @router.post("", response_model=schemas.Country, status_code=status.HTTP_201_CREATED)
 async def add_country(
     country: schemas.CountryCreate,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     db_country = models.Country(**country.model_dump())
     db.add(db_country)
     await db.commit()
     await db.refresh(db_country)
+    reference.invalidate_country(db_country.id_country)
     return db_country
 
 @router.put("/{id}", response_model=schemas.Country)
 async def update_country(
     id: int,
     country_update: schemas.CountryCreate, # Используем Create для полного обновления
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.Country).filter(models.Country.id_country == id))
@@ -65,12 +65,14 @@ async def update_country(
 
     await db.commit()
     await db.refresh(db_country)
+    reference.invalidate_country(db_country.id_country)
+    catalog_snapshot.invalidate_country(db_country.id_country)
     return db_country
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_country(
     id: int,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.Country).filter(models.Country.id_country == id))
@@ -80,4 +82,6 @@ async def delete_country(
 
     await db.delete(db_country)
     await db.commit()
+    reference.invalidate_country(id)
+    catalog_snapshot.invalidate_country(id)
     return {"message": "Страна удалена"}
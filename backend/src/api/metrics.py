@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, status
+
+from backend.src.utils.security import has_role, token_cache_stats
+from backend.src.utils import reference
+from backend.src.utils.events import order_events
+from backend.src.utils.hashing import password_hasher
+from backend.src.utils.inventory import expiration_job
+from backend.src.utils.search import product_names
+from backend.src.utils.snapshot import catalog_snapshot
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(has_role("admin"))],
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_403_FORBIDDEN: {"description": "Forbidden"}
+    },
+)
+
+@router.get("/cache")
+async def get_cache_stats():
+    return {
+        "reference": reference.stats(),
+        "catalog": catalog_snapshot.stats(),
+        "tokens": token_cache_stats(),
+        "autocomplete": product_names.stats(),
+    }
+
+@router.get("/jobs")
+async def get_job_stats():
+    return {"expiration": expiration_job.stats()}
+
+@router.get("/events")
+async def get_event_stats():
+    return order_events.stats()
+
+@router.get("/hashing")
+async def get_hashing_stats():
+    return password_hasher.stats()
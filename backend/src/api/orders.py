@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from sqlalchemy import delete, func, insert, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.future import select
 from typing import List
 from datetime import datetime
 
-from backend.src.utils.security import get_current_active_user, has_role
-from backend.src.utils.db import get_db
+from backend.src.utils.security import CurrentUser, get_current_active_user, has_role
+from backend.src.utils.db import get_db, get_read_db
+from backend.src.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, get_orders_page
+from backend.src.utils import analytics
+from backend.src.utils.events import event_stream_response, order_event, order_topic, publish_order, user_topic
+from backend.src.utils.export import export_response, iter_partitions
+from backend.src.utils.idempotency import idempotent_response, request_fingerprint
+from backend.src.utils.inventory import is_expired_on, orderable
+from backend.src.utils.pricing import price_order
+from backend.src.utils.serialization import model_response
+from backend.src.utils.stock import release_order, reserve, reserve_cart, reserve_order
 from backend.src import models, schemas
 
 router = APIRouter(
@@ -19,23 +30,104 @@ router = APIRouter(
     },
 )
 
-@router.get("/all", response_model=List[schemas.Order])
+@router.get("", response_model=schemas.OrderPage)
+async def get_my_orders(
+    filters: schemas.OrderFilter = Depends(),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    expand: schemas.OrderExpandEnum | None = None,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return model_response(schemas.OrderPage, await get_orders_page(db, filters, current_user.id, limit, cursor, expand))
+
+@router.get("/all", response_model=schemas.OrderPage)
 async def get_all_orders(
-    current_user: schemas.User = Depends(has_role("admin")),
-    db: AsyncSession = Depends(get_db)
+    filters: schemas.OrderFilter = Depends(),
+    id_user: int | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    expand: schemas.OrderExpandEnum | None = None,
+    current_user: CurrentUser = Depends(has_role("admin")),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(
-        select(models.Order).options(
-            selectinload(models.Order.order_details).options(selectinload(models.OrderDetail.product))
+    return model_response(schemas.OrderPage, await get_orders_page(db, filters, id_user, limit, cursor, expand))
+
+ORDER_EXPORT_FIELDS = ["id_order", "id_user", "order_date", "status", "total_amount"]
+ORDER_DETAIL_EXPORT_FIELDS = ["id_order_detail", "id_product", "quantity", "unit_type", "price", "amount"]
+
+
+async def _group_order_rows(partitions):
+    """Собирает плоские строки заказ x деталь (отсортированные по заказу) во вложенные заказы."""
+    current = None
+    async for rows in partitions:
+        completed = []
+        for row in rows:
+            if current is None or current["id_order"] != row["id_order"]:
+                if current is not None:
+                    completed.append(current)
+                current = {field: row[field] for field in ORDER_EXPORT_FIELDS}
+                current["order_details"] = []
+            if row["id_order_detail"] is not None:
+                current["order_details"].append({field: row[field] for field in ORDER_DETAIL_EXPORT_FIELDS})
+        if completed:
+            yield completed
+    if current is not None:
+        yield [current]
+
+
+@router.get("/export")
+async def export_orders(
+    export_format: schemas.ExportFormatEnum = Query(schemas.ExportFormatEnum.NDJSON, alias="format"),
+    order_status: schemas.OrderStatusEnum | None = Query(None, alias="status"),
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    current_user: CurrentUser = Depends(has_role("admin"))
+):
+    """Потоковая выгрузка заказов с деталями: NDJSON (заказ на строку) или CSV (деталь на строку)."""
+    stmt = (
+        select(
+            models.Order.id_order,
+            models.Order.id_user,
+            models.Order.order_date,
+            models.Order.status,
+            models.Order.total_amount,
+            models.OrderDetail.id_order_detail,
+            models.OrderDetail.id_product,
+            models.OrderDetail.quantity,
+            models.OrderDetail.unit_type,
+            models.OrderDetail.price,
+            models.OrderDetail.amount,
         )
+        .outerjoin(models.OrderDetail, models.OrderDetail.id_order == models.Order.id_order)
+        .order_by(models.Order.id_order, models.OrderDetail.id_order_detail)
+    )
+    if order_status is not None:
+        stmt = stmt.where(models.Order.status == order_status)
+    if date_from is not None:
+        stmt = stmt.where(models.Order.order_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(models.Order.order_date < date_to)
+
+    return export_response(
+        iter_partitions(stmt),
+        export_format,
+        ORDER_EXPORT_FIELDS + ORDER_DETAIL_EXPORT_FIELDS,
+        "orders",
+        group=_group_order_rows
     )
-    orders = result.scalars().unique().all()
-    return orders
+
+@router.get("/events")
+async def stream_my_order_events(
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """SSE-поток изменений статусов всех заказов текущего пользователя."""
+    return event_stream_response(user_topic(current_user.id))
 
 @router.get("/{id}", response_model=schemas.Order)
 async def get_order(
     id: int,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
@@ -52,10 +144,30 @@ async def get_order(
 
     return order
 
+@router.get("/{id}/events")
+async def stream_order_events(
+    id: int,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """SSE-поток изменений заказа: текущее состояние, затем каждое изменение статуса."""
+    result = await db.execute(select(models.Order.id_user).filter(models.Order.id_order == id))
+    id_user = result.scalar()
+    if id_user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Заказ не найден")
+    if current_user.role != "admin" and current_user.id != id_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+
+    async def load_initial(read_db: AsyncSession):
+        order = await read_db.get(models.Order, id)
+        return [order_event(order)] if order is not None else []
+
+    return event_stream_response(order_topic(id), load_initial)
+
 @router.get("/{id}/items", response_model=List[schemas.OrderDetail])
 async def get_order_items(
     id: int,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     order_result = await db.execute(
@@ -73,79 +185,138 @@ async def get_order_items(
     return order_details
 
 
-@router.post("", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
-async def create_order(
-    order_data: schemas.OrderCreate,
-    current_user: schemas.User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
-):
-    user_id_for_order = current_user.id
-
+async def _create_order(db: AsyncSession, user_id_for_order: int, order_data: schemas.OrderCreate) -> models.Order:
+    """Создает заказ с деталями в текущей транзакции (flush без commit)."""
     if not order_data.order_details:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Заказ должен содержать хотя бы один товар")
 
+    product_ids = [detail.id_product for detail in order_data.order_details]
+    product_results = await db.execute(
+        select(models.Product).filter(models.Product.id_product.in_(product_ids))
+    )
+    products_map = {p.id_product: p for p in product_results.scalars()}
+
+    for product in products_map.values():
+        if product.is_expired or is_expired_on(product.expiration_date):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Срок годности товара с ID {product.id_product} истек")
+
+    order_details_to_add, total_amount = price_order(products_map, order_data.order_details)
+
+    quantities = {}
+    for detail in order_details_to_add:
+        quantities[detail.id_product] = quantities.get(detail.id_product, 0) + detail.quantity
+    await reserve(db, quantities)
+
+    # Детали привязываются через relationship: после flush заказ со всеми
+    # деталями уже в identity map, и повторный SELECT для ответа не нужен
     db_order = models.Order(
         id_user=user_id_for_order,
         order_date=datetime.now(),
         status=schemas.OrderStatusEnum.PENDING,
-        total_amount=0.0
+        total_amount=total_amount,
+        order_details=order_details_to_add
     )
     db.add(db_order)
     await db.flush()
+    await analytics.apply_order(db, db_order)
+    return db_order
 
-    total_amount = 0.0
-    order_details_to_add = []
 
-    product_ids = [detail.id_product for detail in order_data.order_details]
-    product_results = await db.execute(
-        select(models.Product).filter(models.Product.id_product.in_(product_ids))
-    )
-    products_map = {p.id_product: p for p in product_results.scalars()}
-
-    for detail_data in order_data.order_details:
-        product = products_map.get(detail_data.id_product)
-        if not product:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Товар с ID {detail_data.id_product} не найден")
-
-        unit_type = product.unit_type
-        price = product.price_per_unit
-
-        db_detail = models.OrderDetail(
-            id_order=db_order.id_order,
-            id_product=detail_data.id_product,
-            quantity=detail_data.quantity,
-            unit_type=unit_type,
-            price=price
-        )
-        order_details_to_add.append(db_detail)
-        total_amount += detail_data.quantity * price
+@router.post("", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
+async def create_order(
+    order_data: schemas.OrderCreate,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if idempotency_key is None:
+        db_order = await _create_order(db, current_user.id, order_data)
+        await db.commit()
+        return db_order
 
-    if not order_details_to_add:
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Заказ должен содержать хотя бы один товар")
+    async def produce():
+        db_order = await _create_order(db, current_user.id, order_data)
+        return status.HTTP_201_CREATED, schemas.Order.model_validate(db_order).model_dump_json().encode()
 
-    db_order.total_amount = total_amount
-    db.add_all(order_details_to_add)
+    return await idempotent_response(db, current_user.id, idempotency_key, request_fingerprint(order_data), produce)
 
-    await db.commit()
 
-    final_order_result = await db.execute(
-        select(models.Order).options(
-            selectinload(models.Order.order_details).options(selectinload(models.OrderDetail.product))
-        ).filter(models.Order.id_order == db_order.id_order)
+@router.post("/checkout", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
+async def checkout_cart(
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Оформляет заказ из серверной корзины одной транзакцией и фиксированным
+    числом запросов независимо от размера корзины: INSERT заказа с суммой,
+    посчитанной в SQL, INSERT ... SELECT деталей и DELETE корзины.
+    """
+    # Пустая корзина (или только просроченные товары) не дает строки из-за HAVING
+    order_stmt = insert(models.Order).from_select(
+        ["id_user", "order_date", "status", "total_amount"],
+        select(
+            literal(current_user.id),
+            literal(datetime.now(), models.Order.order_date.type),
+            literal(schemas.OrderStatusEnum.PENDING, models.Order.status.type),
+            # Количество в корзине целое, цена в копейках — произведение точное
+            func.sum(models.CartItem.quantity * models.Product.price_per_unit)
+        )
+        .select_from(models.CartItem)
+        .join(models.Product, models.Product.id_product == models.CartItem.product_id)
+        .where(models.CartItem.user_id == current_user.id, orderable())
+        .having(func.count() > 0)
+    ).returning(models.Order)
+    db_order = (await db.execute(order_stmt)).scalars().first()
+    if db_order is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="В корзине нет товаров, доступных для заказа")
+
+    details_stmt = insert(models.OrderDetail).from_select(
+        ["id_order", "id_product", "quantity", "unit_type", "price", "amount"],
+        select(
+            literal(db_order.id_order),
+            models.Product.id_product,
+            models.CartItem.quantity,
+            models.Product.unit_type,
+            models.Product.price_per_unit,
+            models.CartItem.quantity * models.Product.price_per_unit
+        )
+        .select_from(models.CartItem)
+        .join(models.Product, models.Product.id_product == models.CartItem.product_id)
+        .where(models.CartItem.user_id == current_user.id, orderable())
+    ).returning(models.OrderDetail)
+    order_details = (await db.execute(details_stmt)).scalars().all()
+    try:
+        await reserve_cart(db, current_user.id, {detail.id_product for detail in order_details})
+    except HTTPException:
+        await db.rollback()
+        raise
+    await analytics.apply_order(db, db_order)
+
+    # Просроченные товары не попадают в заказ и остаются в корзине
+    await db.execute(
+        delete(models.CartItem).where(
+            models.CartItem.user_id == current_user.id,
+            models.CartItem.product_id.in_([detail.id_product for detail in order_details])
+        )
     )
-    final_order = final_order_result.scalars().unique().first()
+    await db.commit()
 
-    return final_order
+    set_committed_value(db_order, "order_details", list(order_details))
+    return db_order
 
 
 @router.put("/{id}", response_model=schemas.Order)
 async def update_order(
     id: int,
     order_update_data: schemas.OrderUpdate,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(models.Order).filter(models.Order.id_order == id))
+    result = await db.execute(
+        select(models.Order).options(
+            selectinload(models.Order.order_details)
+        ).filter(models.Order.id_order == id)
+    )
     db_order = result.scalars().first()
     if db_order is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Заказ не найден")
@@ -158,25 +329,27 @@ async def update_order(
     if not update_data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Нет данных для обновления")
 
+    previous_status = db_order.status
     for key, value in update_data.items():
         setattr(db_order, key, value)
+    await analytics.apply_status_change(db, db_order, previous_status)
 
-    await db.commit()
-
-    final_order_result = await db.execute(
-        select(models.Order).options(
-            selectinload(models.Order.order_details).options(selectinload(models.OrderDetail.product))
-        ).filter(models.Order.id_order == db_order.id_order)
-    )
-    final_order = final_order_result.scalars().unique().first()
+    cancelled = schemas.OrderStatusEnum.CANCELLED
+    if previous_status != cancelled and db_order.status == cancelled:
+        await release_order(db, db_order.id_order)
+    elif previous_status == cancelled and db_order.status != cancelled:
+        await reserve_order(db, db_order.id_order)
 
-    return final_order
+    await db.commit()
+    if db_order.status != previous_status:
+        publish_order(db_order)
+    return db_order
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_order(
     id: int,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.Order).filter(models.Order.id_order == id))
@@ -184,6 +357,10 @@ async def delete_order(
     if db_order is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Заказ не найден")
 
+    if analytics.is_counted(db_order.status):
+        # Отмененный заказ уже вернул остаток на склад
+        await analytics.apply_order(db, db_order, -1)
+        await release_order(db, db_order.id_order)
     await db.delete(db_order)
     await db.commit()
     return {"message: Заказ удален"}
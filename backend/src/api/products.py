@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from typing import List
 
-from backend.src.utils.security import has_role
-from backend.src.utils.db import get_db
+from backend.src.utils.security import CurrentUser, has_role
+from backend.src.utils.db import get_db, get_read_db
+from backend.src.utils import ratings, reference
+from backend.src.utils.inventory import is_expired_on
+from backend.src.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from backend.src.utils.product_import import import_products
+from backend.src.utils.search import product_names, search_products
+from backend.src.utils.snapshot import catalog_response, catalog_snapshot
 from backend.src import models, schemas
 
 router = APIRouter(
@@ -16,23 +22,37 @@ router = APIRouter(
         status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"}
     },
 )
-@router.get("/all", response_model=List[schemas.Product])
+@router.get("/all", response_model=schemas.ProductPage)
 async def get_all_products(
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    filters: schemas.ProductFilter = Depends(),
+    sort: schemas.ProductSortEnum = schemas.ProductSortEnum.ID_ASC,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(
-        select(models.Product).options(
-            selectinload(models.Product.country),
-            selectinload(models.Product.category)
-        )
-    )
-    products = result.scalars().all()
-    return products
+    return await catalog_response(request, db, filters, sort, limit, cursor)
+
+@router.get("/search", response_model=List[schemas.Product])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await search_products(db, q, limit)
+
+@router.get("/autocomplete", response_model=List[schemas.ProductSuggestion])
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await product_names.suggest(db, q, limit)
 
 @router.get("/{id}", response_model=schemas.Product)
 async def get_product(
     id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     result = await db.execute(
         select(models.Product).options(
@@ -45,57 +65,97 @@ async def get_product(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Товар не найден")
     return product
 
-@router.get("/country/{id}", response_model=List[schemas.Product])
-async def get_products_by_country(
+@router.get("/{id}/rating", response_model=schemas.ProductRating)
+async def get_product_rating(
     id: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    result = await db.execute(select(models.Product).filter(models.Product.id_product == id))
+    product = result.scalars().first()
+    if product is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Товар не найден")
+    return ratings.product_rating(product)
+
+@router.post("/ratings/rebuild")
+async def rebuild_product_ratings(
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
-    country_result = await db.execute(select(models.Country).filter(models.Country.id_country == id))
-    if country_result.scalars().first() is None:
-         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Страна не найдена")
+    updated = await ratings.rebuild_ratings(db)
+    catalog_snapshot.clear()
+    return {"updated": updated}
 
+@router.get("/{id}/stock", response_model=schemas.ProductStock)
+async def get_product_stock(
+    id: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Остаток не входит в schemas.Product: иначе каждая продажа сбрасывала бы снимок каталога
     result = await db.execute(
-        select(models.Product).options(
-            selectinload(models.Product.country),
-            selectinload(models.Product.category)
-        ).filter(models.Product.id_country == id)
+        select(models.Product.id_product, models.Product.stock).filter(models.Product.id_product == id)
     )
-    products = result.scalars().all()
-    return products
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Товар не найден")
+    return schemas.ProductStock(id_product=row.id_product, stock=row.stock)
+
+@router.get("/country/{id}", response_model=schemas.ProductPage)
+async def get_products_by_country(
+    id: int,
+    request: Request,
+    filters: schemas.ProductFilter = Depends(),
+    sort: schemas.ProductSortEnum = schemas.ProductSortEnum.ID_ASC,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    if await reference.get_country(db, id) is None:
+         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Страна не найдена")
+
+    filters.id_country = id
+    return await catalog_response(request, db, filters, sort, limit, cursor)
 
 @router.post("", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
 async def add_product(
     product_data: schemas.ProductCreate,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
-    cat_res = await db.execute(select(models.Category).filter(models.Category.id_category == product_data.id_category))
-    if not cat_res.scalars().first():
+    if await reference.get_category(db, product_data.id_category) is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Категория с ID {product_data.id_category} не найдена")
 
-    country_res = await db.execute(select(models.Country).filter(models.Country.id_country == product_data.id_country))
-    if not country_res.scalars().first():
+    if await reference.get_country(db, product_data.id_country) is None:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Страна с ID {product_data.id_country} не найдена")
 
-    db_product = models.Product(**product_data.model_dump())
+    db_product = models.Product(**product_data.model_dump(), is_expired=is_expired_on(product_data.expiration_date))
     db.add(db_product)
     await db.commit()
-    await db.refresh(db_product)
-
-    result_with_relations = await db.execute(
-        select(models.Product).options(
-            selectinload(models.Product.country),
-            selectinload(models.Product.category)
-        ).filter(models.Product.id_product == db_product.id_product)
-    )
-    final_product = result_with_relations.scalars().first()
-    return final_product
+    catalog_snapshot.invalidate_product(db_product.id_product)
+    product_names.invalidate()
+    return await reference.build_product(db, db_product)
+
+@router.post("/bulk", response_model=schemas.ProductImportReport)
+async def bulk_import_products(
+    request: Request,
+    import_format: schemas.ExportFormatEnum = Query(schemas.ExportFormatEnum.NDJSON, alias="format"),
+    current_user: CurrentUser = Depends(has_role("admin")),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Импорт прайс-листа поставщика (NDJSON или CSV с заголовком). Строка без
+    id_product создает товар, полная строка с id_product — upsert, частичная —
+    обновляет указанные поля. Ошибочные строки пропускаются и попадают в отчет.
+    """
+    report = await import_products(db, request.stream(), import_format)
+    catalog_snapshot.clear()
+    product_names.invalidate()
+    return report
 
 @router.put("/{id}", response_model=schemas.Product)
 async def update_product(
     id: int,
     product_update_data: schemas.ProductUpdate,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.Product).filter(models.Product.id_product == id))
@@ -106,12 +166,10 @@ async def update_product(
     update_data = product_update_data.model_dump(exclude_unset=True)
 
     if 'id_category' in update_data:
-        cat_res = await db.execute(select(models.Category).filter(models.Category.id_category == update_data['id_category']))
-        if not cat_res.scalars().first():
+        if await reference.get_category(db, update_data['id_category']) is None:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Категория с ID {update_data['id_category']} не найдена")
     if 'id_country' in update_data:
-        country_res = await db.execute(select(models.Country).filter(models.Country.id_country == update_data['id_country']))
-        if not country_res.scalars().first():
+        if await reference.get_country(db, update_data['id_country']) is None:
              raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Страна с ID {update_data['id_country']} не найдена")
 
     if not update_data:
@@ -119,24 +177,19 @@ async def update_product(
 
     for key, value in update_data.items():
         setattr(db_product, key, value)
+    if 'expiration_date' in update_data:
+        db_product.is_expired = is_expired_on(db_product.expiration_date)
 
     await db.commit()
-    await db.refresh(db_product)
-
-    result_with_relations = await db.execute(
-        select(models.Product).options(
-            selectinload(models.Product.country),
-            selectinload(models.Product.category)
-        ).filter(models.Product.id_product == db_product.id_product)
-    )
-    final_product = result_with_relations.scalars().first()
-    return final_product
+    catalog_snapshot.invalidate_product(db_product.id_product)
+    product_names.invalidate()
+    return await reference.build_product(db, db_product)
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product(
     id: int,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.Product).filter(models.Product.id_product == id))
@@ -146,4 +199,6 @@ async def delete_product(
 
     await db.delete(db_product)
     await db.commit()
+    catalog_snapshot.invalidate_product(id)
+    product_names.invalidate()
     return {"message": "Товар удален"}
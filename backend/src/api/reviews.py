@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from typing import List
 
-from backend.src.utils.security import get_current_active_user
-from backend.src.utils.db import get_db
+from backend.src.utils.security import CurrentUser, get_current_active_user, has_role
+from backend.src.utils.db import get_db, get_read_db
+from backend.src.utils.export import export_response, iter_partitions
+from backend.src.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, get_reviews_page
+from backend.src.utils.serialization import model_response
+from backend.src.utils.ratings import apply_rating_delta
+from backend.src.utils.snapshot import catalog_snapshot
 from backend.src import models, schemas
 
 router = APIRouter(
@@ -18,23 +23,35 @@ router = APIRouter(
     },
 )
 
-@router.get("/all", response_model=List[schemas.Review])
+@router.get("/all", response_model=schemas.ReviewPage)
 async def get_all_reviews(
-    db: AsyncSession = Depends(get_db)
+    sort: schemas.ReviewSortEnum = schemas.ReviewSortEnum.NEWEST,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(
-        select(models.Review).options(
-            selectinload(models.Review.product),
-            selectinload(models.Review.user)
-        )
-    )
-    reviews = result.scalars().unique().all()
-    return reviews
+    return model_response(schemas.ReviewPage, await get_reviews_page(db, sort=sort, limit=limit, cursor=cursor))
+
+REVIEW_EXPORT_FIELDS = ["id_review", "id_user", "id_product", "rating", "comment", "created_at"]
+
+@router.get("/export")
+async def export_reviews(
+    export_format: schemas.ExportFormatEnum = Query(schemas.ExportFormatEnum.NDJSON, alias="format"),
+    id_product: int | None = None,
+    id_user: int | None = None,
+    current_user: CurrentUser = Depends(has_role("admin"))
+):
+    stmt = select(*(getattr(models.Review, field) for field in REVIEW_EXPORT_FIELDS)).order_by(models.Review.id_review)
+    if id_product is not None:
+        stmt = stmt.where(models.Review.id_product == id_product)
+    if id_user is not None:
+        stmt = stmt.where(models.Review.id_user == id_user)
+    return export_response(iter_partitions(stmt), export_format, REVIEW_EXPORT_FIELDS, "reviews")
 
 @router.get("/{id}", response_model=schemas.Review)
 async def get_review(
     id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     result = await db.execute(
         select(models.Review).options(
@@ -47,29 +64,29 @@ async def get_review(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Отзыв не найден")
     return review
 
-@router.get("/product/{id}", response_model=List[schemas.Review])
+@router.get("/product/{id}", response_model=schemas.ReviewPage)
 async def get_reviews_by_product(
     id: int,
-    db: AsyncSession = Depends(get_db)
+    sort: schemas.ReviewSortEnum = schemas.ReviewSortEnum.NEWEST,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
     product_result = await db.execute(select(models.Product).filter(models.Product.id_product == id))
     if product_result.scalars().first() is None:
          raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Продукт не найден")
 
-    result = await db.execute(
-        select(models.Review).options(
-            selectinload(models.Review.user)
-        ).filter(models.Review.id_product == id)
-    )
-    reviews = result.scalars().unique().all()
-    return reviews
+    return model_response(schemas.ReviewPage, await get_reviews_page(db, id_product=id, sort=sort, limit=limit, cursor=cursor))
 
 
-@router.get("/user/{user_id}", response_model=List[schemas.Review])
+@router.get("/user/{user_id}", response_model=schemas.ReviewPage)
 async def get_reviews_by_user(
     user_id: int,
-    current_user: schemas.User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    sort: schemas.ReviewSortEnum = schemas.ReviewSortEnum.NEWEST,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "admin" and current_user.id != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав для просмотра чужих отзывов")
@@ -78,18 +95,12 @@ async def get_reviews_by_user(
     if user_check_result.scalars().first() is None:
          raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден")
 
-    result = await db.execute(
-        select(models.Review).options(
-            selectinload(models.Review.product)
-        ).filter(models.Review.id_user == user_id)
-    )
-    reviews = result.scalars().unique().all()
-    return reviews
+    return model_response(schemas.ReviewPage, await get_reviews_page(db, id_user=user_id, sort=sort, limit=limit, cursor=cursor))
 
 @router.post("", response_model=schemas.Review, status_code=status.HTTP_201_CREATED)
 async def add_review(
     review_data: schemas.ReviewCreate,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     review_dict = review_data.model_dump()
@@ -101,38 +112,28 @@ async def add_review(
     user_id = current_user.id
     review_dict['id_user'] = user_id
 
-    existing_review = await db.execute(
-        select(models.Review).filter(
-            models.Review.id_user == user_id,
-            models.Review.id_product == review_dict['id_product']
-        )
-    )
-    if existing_review.scalars().first():
+    db_review = models.Review(**review_dict)
+
+    db.add(db_review)
+    # Повторный отзыв отсекает уникальный индекс (id_user, id_product)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Вы уже оставили отзыв на этот товар."
         )
-
-    db_review = models.Review(**review_dict)
-
-    db.add(db_review)
+    await apply_rating_delta(db, db_review.id_product, added=db_review.rating)
     await db.commit()
-
-    result_with_relations = await db.execute(
-        select(models.Review).options(
-            selectinload(models.Review.product),
-            selectinload(models.Review.user)
-        ).filter(models.Review.id_review == db_review.id_review)
-    )
-    final_review = result_with_relations.scalars().unique().first()
-
-    return final_review
+    catalog_snapshot.invalidate_product(db_review.id_product)
+    return db_review
 
 @router.put("/{id}", response_model=schemas.Review)
 async def update_review(
     id: int,
     review_update_data: schemas.ReviewUpdate,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.Review).filter(models.Review.id_review == id))
@@ -148,25 +149,21 @@ async def update_review(
     if not update_data:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Нет данных для обновления (можно обновить 'rating' и 'comment')")
 
+    previous_rating = db_review.rating
     for key, value in update_data.items():
         setattr(db_review, key, value)
 
+    if db_review.rating != previous_rating:
+        await apply_rating_delta(db, db_review.id_product, added=db_review.rating, removed=previous_rating)
     await db.commit()
-
-    result_with_relations = await db.execute(
-        select(models.Review).options(
-            selectinload(models.Review.product),
-            selectinload(models.Review.user)
-        ).filter(models.Review.id_review == db_review.id_review)
-    )
-    final_review = result_with_relations.scalars().unique().first()
-
-    return final_review
+    if db_review.rating != previous_rating:
+        catalog_snapshot.invalidate_product(db_review.id_product)
+    return db_review
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_review(
     id: int,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.Review).filter(models.Review.id_review == id))
@@ -178,5 +175,7 @@ async def delete_review(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав для удаления этого отзыва")
 
     await db.delete(db_review)
+    await apply_rating_delta(db, db_review.id_product, removed=db_review.rating)
     await db.commit()
+    catalog_snapshot.invalidate_product(db_review.id_product)
     return None
\ No newline at end of file
@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 from datetime import timedelta
 
-from backend.src.utils.db import get_db
+from backend.src.utils import analytics
+from backend.src.utils.db import get_db, get_read_db
+from backend.src.utils.export import export_response, iter_partitions
+from backend.src.utils.hashing import password_hasher
+from backend.src.utils.ratings import remove_user_ratings
 from backend.src.utils.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES, 
+    CurrentUser,
     authenticate_user, 
     create_access_token, 
-    get_password_hash, 
     get_current_active_user, 
-    has_role
+    has_role,
+    revoke_user_state
 )
+from backend.src.utils.snapshot import catalog_snapshot
+from backend.src.utils.stock import release_order
 from backend.src import schemas, models
 
 router = APIRouter(
@@ -29,7 +37,7 @@ router = APIRouter(
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
@@ -68,7 +76,9 @@ async def register_user(
             detail="Пользователь с таким email уже существует"
         )
 
-    hashed_password = get_password_hash(user_data.password)
+    # Хэширование идет без открытой транзакции: соединение писателя свободно для других запросов
+    await db.commit()
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = models.User(
         username=user_data.username,
         email=user_data.email,
@@ -78,29 +88,53 @@ async def register_user(
         phone=user_data.phone
     )
     db.add(db_user)
-    await db.commit()
+    # Имя или email могли занять, пока считался хэш
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Пользователь с таким именем или email уже существует"
+        )
     await db.refresh(db_user)
     return db_user
 
 @router.get("/", response_model=List[schemas.User])
 async def get_users(
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(models.User))
     users = result.scalars().all()
     return users
 
+USER_EXPORT_FIELDS = ["id", "username", "email", "full_name", "address", "phone", "is_active", "role"]
+
+@router.get("/export")
+async def export_users(
+    export_format: schemas.ExportFormatEnum = Query(schemas.ExportFormatEnum.NDJSON, alias="format"),
+    role: str | None = None,
+    is_active: bool | None = None,
+    current_user: CurrentUser = Depends(has_role("admin"))
+):
+    stmt = select(*(getattr(models.User, field) for field in USER_EXPORT_FIELDS)).order_by(models.User.id)
+    if role is not None:
+        stmt = stmt.where(models.User.role == role)
+    if is_active is not None:
+        stmt = stmt.where(models.User.is_active == is_active)
+    return export_response(iter_partitions(stmt), export_format, USER_EXPORT_FIELDS, "users")
+
 @router.get("/me", response_model=schemas.User)
 async def get_me(
-        current_user: schemas.User = Depends(get_current_active_user),
+        current_user: CurrentUser = Depends(get_current_active_user),
 ):
-    return current_user
+    return await current_user.load()
 
 @router.get("/{user_id}", response_model=schemas.User)
 async def get_user(
     user_id: int,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin" and current_user.id != user_id:
@@ -124,7 +158,7 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_update_data: schemas.UserProfileUpdate,
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin" and current_user.id != user_id:
@@ -152,7 +186,9 @@ async def update_user(
 
     if "password" in update_data:
         if update_data["password"]:
-            update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
+            # Хэширование идет без открытой транзакции: соединение писателя свободно для других запросов
+            await db.commit()
+            update_data["hashed_password"] = await password_hasher.hash(update_data.pop("password"))
         else:
              del update_data["password"]
 
@@ -170,7 +206,7 @@ async def update_user(
 async def admin_update_user(
     user_id: int,
     user_admin_update_data: schemas.UserAdminUpdate,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
@@ -193,13 +229,14 @@ async def admin_update_user(
 
     await db.commit()
     await db.refresh(db_user)
+    revoke_user_state(user_id)
     return db_user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     if current_user.id == user_id:
@@ -218,14 +255,26 @@ async def delete_user(
             detail="Пользователь не найден"
         )
 
+    # Заказы удаляются каскадом: как в delete_order, неотмененные вычитаются
+    # из сводок продаж и возвращают списанный остаток
+    result = await db.execute(select(models.Order).filter(models.Order.id_user == user_id))
+    for db_order in result.scalars():
+        if analytics.is_counted(db_order.status):
+            await analytics.apply_order(db, db_order, -1)
+            await release_order(db, db_order.id_order)
+
+    rated_products = await remove_user_ratings(db, user_id)
     await db.delete(db_user)
     await db.commit()
+    revoke_user_state(user_id)
+    for id_product in rated_products:
+        catalog_snapshot.invalidate_product(id_product)
     return None
 
 @router.post("/{user_id}/make-admin", response_model=schemas.User)
 async def make_user_admin(
     user_id: int,
-    current_user: schemas.User = Depends(has_role("admin")),
+    current_user: CurrentUser = Depends(has_role("admin")),
     db: AsyncSession = Depends(get_db)
 ):
     if current_user.id == user_id:
@@ -253,4 +302,5 @@ async def make_user_admin(
     db_user.role = "admin"
     await db.commit()
     await db.refresh(db_user)
+    revoke_user_state(user_id)
     return db_user
\ No newline at end of file
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Enum, Date, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Enum, Date, UniqueConstraint, Index, LargeBinary, Numeric
 from sqlalchemy.orm import relationship
 from backend.src.utils.db import Base
+from backend.src.utils.money import Money
 from backend.src.schemas import UnitType, OrderStatusEnum
 import datetime
 
@@ -9,27 +10,62 @@ class Order(Base):
     id_order = Column(Integer, primary_key=True, index=True)
     id_user = Column(Integer, ForeignKey('users.id'))
     order_date = Column(DateTime, default=datetime.datetime.now)
-    total_amount = Column(Float, default=0.0)
+    total_amount = Column(Money, default=0)
     status = Column(Enum(OrderStatusEnum), default=OrderStatusEnum.PENDING, nullable=False)
        
     user = relationship("User", back_populates="orders")
     order_details = relationship("OrderDetail", back_populates="order", cascade="all, delete-orphan")
 
+    # Keyset-пагинация истории заказов по (order_date, id_order)
+    __table_args__ = (
+        Index('ix_orders_date_id', 'order_date', 'id_order'),
+        Index('ix_orders_user_date_id', 'id_user', 'order_date', 'id_order'),
+        Index('ix_orders_status_date_id', 'status', 'order_date', 'id_order'),
+    )
+
 class Product(Base):
     __tablename__ = 'products'
     id_product = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     id_country = Column(Integer, ForeignKey('countries.id_country'))
     id_category = Column(Integer, ForeignKey('categories.id_category'))
-    price_per_unit = Column(Float)
+    price_per_unit = Column(Money)
     unit_type = Column(Enum(UnitType))
     expiration_date = Column(Date)
-    
+    # Остаток в единицах unit_type; NULL — не ведется. Меняется только
+    # условными UPDATE из utils/stock.py
+    stock = Column(Numeric(12, 3, asdecimal=False), nullable=True)
+    # Выставляется фоновой задачей utils/inventory.py
+    is_expired = Column(Boolean, default=False, server_default='0', nullable=False)
+
+    # Денормализованные агрегаты отзывов, поддерживаются api/reviews.py
+    rating_count = Column(Integer, default=0, server_default='0', nullable=False)
+    rating_sum = Column(Integer, default=0, server_default='0', nullable=False)
+    rating_average = Column(Float, default=0.0, server_default='0', nullable=False)
+    rating_1 = Column(Integer, default=0, server_default='0', nullable=False)
+    rating_2 = Column(Integer, default=0, server_default='0', nullable=False)
+    rating_3 = Column(Integer, default=0, server_default='0', nullable=False)
+    rating_4 = Column(Integer, default=0, server_default='0', nullable=False)
+    rating_5 = Column(Integer, default=0, server_default='0', nullable=False)
+
     country = relationship("Country", back_populates="products")
     category = relationship("Category", back_populates="products")
     order_details = relationship("OrderDetail", back_populates="product")
     reviews = relationship("Review", back_populates="product", cascade="all, delete-orphan")
 
+    # Составные индексы под keyset-пагинацию каталога; is_expired впереди,
+    # так как витрина по умолчанию показывает только непросроченные товары
+    __table_args__ = (
+        Index('ix_products_available_id', 'is_expired', 'id_product'),
+        Index('ix_products_price_id', 'is_expired', 'price_per_unit', 'id_product'),
+        Index('ix_products_category_id', 'is_expired', 'id_category', 'id_product'),
+        Index('ix_products_category_price_id', 'is_expired', 'id_category', 'price_per_unit', 'id_product'),
+        Index('ix_products_country_id', 'is_expired', 'id_country', 'id_product'),
+        Index('ix_products_country_price_id', 'is_expired', 'id_country', 'price_per_unit', 'id_product'),
+        Index('ix_products_rating_id', 'is_expired', 'rating_average', 'id_product'),
+        Index('ix_products_expiration', 'is_expired', 'expiration_date'),
+    )
+
 class Country(Base):
     __tablename__ = 'countries'
     id_country = Column(Integer, primary_key=True, index=True)
@@ -44,10 +80,20 @@ class Review(Base):
     id_product = Column(Integer, ForeignKey('products.id_product'))
     rating = Column(Integer)
     comment = Column(Text)
-       
+    created_at = Column(DateTime, default=datetime.datetime.now)
+
     user = relationship("User", back_populates="reviews")
     product = relationship("Product", back_populates="reviews")
 
+    # Один отзыв на товар от пользователя; индексы под ленты отзывов
+    __table_args__ = (
+        UniqueConstraint('id_user', 'id_product', name='uq_review_user_product'),
+        Index('ix_reviews_product_id', 'id_product', 'id_review'),
+        Index('ix_reviews_product_rating_id', 'id_product', 'rating', 'id_review'),
+        Index('ix_reviews_user_id', 'id_user', 'id_review'),
+        Index('ix_reviews_user_rating_id', 'id_user', 'rating', 'id_review'),
+    )
+
 class Category(Base):
     __tablename__ = 'categories'
     id_category = Column(Integer, primary_key=True, index=True)
@@ -80,7 +126,9 @@ class OrderDetail(Base):
     id_product = Column(Integer, ForeignKey("products.id_product"))
     quantity = Column(Float, nullable=False)
     unit_type = Column(Enum(UnitType), nullable=False)
-    price = Column(Float, nullable=False)
+    price = Column(Money, nullable=False)
+    # Сумма строки, округленная до копеек при оформлении
+    amount = Column(Money, nullable=True)
 
     order = relationship("Order", back_populates="order_details")
     product = relationship("Product", back_populates="order_details")
@@ -96,4 +144,55 @@ class CartItem(Base):
     user = relationship("User")
     product = relationship("Product")
 
-    __table_args__ = (UniqueConstraint('user_id', 'product_id', name='uq_user_product'),)
\ No newline at end of file
+    __table_args__ = (UniqueConstraint('user_id', 'product_id', name='uq_user_product'),)
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+
+    id_user = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    # NULL, пока первый запрос с этим ключом еще выполняется
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.now, nullable=False, index=True)
+
+class SalesRollup(Base):
+    """Продажи товара за день; поддерживается инкрементально utils/analytics.py."""
+    __tablename__ = 'sales_rollup'
+
+    day = Column(Date, primary_key=True)
+    id_product = Column(Integer, primary_key=True)
+    # Категория и страна на момент продажи
+    id_category = Column(Integer, nullable=True)
+    id_country = Column(Integer, nullable=True)
+    revenue = Column(Money, default=0, nullable=False)
+    units = Column(Float, default=0.0, nullable=False)
+    lines = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index('ix_sales_rollup_product_day', 'id_product', 'day'),
+        Index('ix_sales_rollup_category_day', 'id_category', 'day'),
+        Index('ix_sales_rollup_country_day', 'id_country', 'day'),
+    )
+
+class SalesDaily(Base):
+    __tablename__ = 'sales_daily'
+
+    day = Column(Date, primary_key=True)
+    orders = Column(Integer, default=0, nullable=False)
+    revenue = Column(Money, default=0, nullable=False)
+
+class SalesGroupOrders(Base):
+    """
+    Число заказов за день по категории, стране или товару: заказ с несколькими
+    строками одной группы считается один раз, поэтому из sales_rollup не выводится.
+    """
+    __tablename__ = 'sales_group_orders'
+
+    day = Column(Date, primary_key=True)
+    # Значение SalesGroupEnum: category, country или product
+    dimension = Column(String(16), primary_key=True)
+    # 0 — товар без категории или страны
+    key = Column(Integer, primary_key=True)
+    orders = Column(Integer, default=0, nullable=False)
@@ -43,6 +43,8 @@ class ProductBase(BaseModel):
 class ProductCreate(ProductBase):
     id_country: int
     id_category: int
+    # None — остаток не ведется
+    stock: float | None = Field(None, ge=0)
 
 class ProductUpdate(BaseModel):
     name: str | None = None
@@ -51,15 +53,71 @@ class ProductUpdate(BaseModel):
     expiration_date: date | None = None
     id_country: int | None = None
     id_category: int | None = None
+    stock: float | None = Field(None, ge=0)
+
+class ProductStock(BaseModel):
+    id_product: int
+    stock: float | None
 
 class Product(ProductBase):
     id_product: int
     country: Country
     category: Category
+    rating_count: int = 0
+    rating_average: float = 0.0
+    is_expired: bool = False
 
     class Config:
         from_attributes = True
 
+class ProductRating(BaseModel):
+    id_product: int
+    count: int
+    average: float
+    histogram: dict[int, int]
+
+class ProductSortEnum(str, Enum):
+    ID_ASC = "id_asc"
+    ID_DESC = "id_desc"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+    RATING_DESC = "rating_desc"
+
+class ProductFilter(BaseModel):
+    id_category: int | None = None
+    id_country: int | None = None
+    min_price: float | None = Field(None, ge=0)
+    max_price: float | None = Field(None, ge=0)
+    unit_type: UnitType | None = None
+    # По умолчанию просроченные товары скрыты; true — показать и их
+    include_expired: bool = False
+
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: str | None = None
+
+class ProductImportRow(BaseModel):
+    id_product: int | None = None
+    name: str | None = None
+    price_per_unit: float | None = None
+    unit_type: UnitType | None = None
+    expiration_date: date | None = None
+    id_country: int | None = None
+    id_category: int | None = None
+
+class ProductImportError(BaseModel):
+    row: int
+    detail: str
+
+class ProductImportReport(BaseModel):
+    inserted: int
+    updated: int
+    errors: List[ProductImportError]
+
+class ProductSuggestion(BaseModel):
+    id_product: int
+    name: str
+
 class ProductInCart(ProductBase):
     id_product: int
     model_config = ConfigDict(from_attributes=True)
@@ -82,6 +140,19 @@ class CartItem(CartItemBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class CartOperationEnum(str, Enum):
+    SET = "set"
+    INCREMENT = "increment"
+    REMOVE = "remove"
+
+class CartOperation(BaseModel):
+    op: CartOperationEnum
+    product_id: int
+    quantity: int = 0
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=200)
+
 # --- Детали Заказа ---
 class OrderDetailBase(BaseModel):
     id_product: int
@@ -95,6 +166,7 @@ class OrderDetail(OrderDetailBase):
     id_order: int
     unit_type: UnitType
     price: float
+    amount: float | None = None
 
     class Config:
         from_attributes = True
@@ -126,6 +198,32 @@ class Order(OrderBase):
     class Config:
         from_attributes = True
 
+class OrderFilter(BaseModel):
+    status: OrderStatusEnum | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+
+class OrderExpandEnum(str, Enum):
+    ITEMS = "items"
+
+class OrderListItem(OrderBase):
+    id_order: int
+    order_date: datetime
+    total_amount: float
+    status: OrderStatusEnum
+    # Заполняется только при expand=items
+    order_details: List[OrderDetail] | None = None
+
+class OrderPage(BaseModel):
+    items: List[OrderListItem]
+    next_cursor: str | None = None
+
+class OrderEvent(BaseModel):
+    id_order: int
+    id_user: int
+    status: OrderStatusEnum
+    total_amount: float
+
 # --- Отзывы ---
 class ReviewBase(BaseModel):
     rating: int = Field(..., ge=1, le=5)
@@ -143,10 +241,19 @@ class Review(ReviewBase):
     id_review: int
     id_user: int
     id_product: int
+    created_at: datetime | None = None
 
     class Config:
         from_attributes = True
 
+class ReviewSortEnum(str, Enum):
+    NEWEST = "newest"
+    RATING_DESC = "rating_desc"
+
+class ReviewPage(BaseModel):
+    items: List[Review]
+    next_cursor: str | None = None
+
 # --- Пользователи ---
 class UserProfileUpdate(BaseModel):
     email: str | None = None
@@ -188,6 +295,33 @@ class User(UserBase):
     class Config:
         from_attributes = True
         
+# --- Выгрузки ---
+class ExportFormatEnum(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+# --- Аналитика ---
+class SalesGroupEnum(str, Enum):
+    DAY = "day"
+    CATEGORY = "category"
+    COUNTRY = "country"
+    PRODUCT = "product"
+
+class SalesMetricEnum(str, Enum):
+    REVENUE = "revenue"
+    UNITS = "units"
+
+class SalesFilter(BaseModel):
+    date_from: date | None = None
+    date_to: date | None = None
+
+class SalesBucket(BaseModel):
+    key: str
+    label: str | None = None
+    revenue: float
+    units: float
+    orders: int
+
 # --- Токены ---
 class Token(BaseModel):
     access_token: str
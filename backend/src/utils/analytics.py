@@ -0,0 +1,234 @@
+from sqlalchemy import Date, Integer, cast, delete, distinct, func, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models, schemas
+from backend.src.utils import reference
+from backend.src.utils.db import dialect_insert
+
+# Отмененные заказы в выручку не входят
+COUNTED_STATUSES = frozenset(status for status in schemas.OrderStatusEnum if status != schemas.OrderStatusEnum.CANCELLED)
+
+
+def is_counted(order_status) -> bool:
+    return schemas.OrderStatusEnum(order_status) in COUNTED_STATUSES
+
+
+# Ключи групп, по которым считается число заказов; NULL (товар без категории
+# или страны) хранится как 0, чтобы войти в первичный ключ
+ORDER_GROUP_KEYS = {
+    schemas.SalesGroupEnum.CATEGORY: func.coalesce(models.Product.id_category, 0),
+    schemas.SalesGroupEnum.COUNTRY: func.coalesce(models.Product.id_country, 0),
+    schemas.SalesGroupEnum.PRODUCT: models.OrderDetail.id_product,
+}
+
+
+def _upsert_group_orders(db: AsyncSession, keys):
+    stmt = dialect_insert(db, models.SalesGroupOrders).from_select(["day", "dimension", "key", "orders"], keys)
+    return stmt.on_conflict_do_update(
+        index_elements=["day", "dimension", "key"],
+        set_={"orders": models.SalesGroupOrders.orders + stmt.excluded.orders}
+    )
+
+
+async def apply_order(db: AsyncSession, order: models.Order, sign: int = 1) -> None:
+    """
+    Добавляет (sign=1) или вычитает (sign=-1) заказ из сводных таблиц в текущей
+    транзакции: один INSERT ... SELECT ... ON CONFLICT по строкам заказа,
+    сгруппированным по товару, один по различным группам заказа (по одному
+    заказу на группу) и один upsert дневного итога.
+    """
+    day = order.order_date.date()
+
+    rollup = dialect_insert(db, models.SalesRollup).from_select(
+        ["day", "id_product", "id_category", "id_country", "revenue", "units", "lines"],
+        select(
+            literal(day, models.SalesRollup.day.type),
+            models.OrderDetail.id_product,
+            func.max(models.Product.id_category),
+            func.max(models.Product.id_country),
+            # Множитель явно целый: иначе он привязался бы к типу Money
+            func.sum(models.OrderDetail.amount) * literal(sign, Integer),
+            func.sum(models.OrderDetail.quantity) * sign,
+            func.count() * sign
+        )
+        .select_from(models.OrderDetail)
+        .outerjoin(models.Product, models.Product.id_product == models.OrderDetail.id_product)
+        .where(models.OrderDetail.id_order == order.id_order)
+        .group_by(models.OrderDetail.id_product)
+    )
+    rollup = rollup.on_conflict_do_update(
+        index_elements=["day", "id_product"],
+        set_={
+            "revenue": models.SalesRollup.revenue + rollup.excluded.revenue,
+            "units": models.SalesRollup.units + rollup.excluded.units,
+            "lines": models.SalesRollup.lines + rollup.excluded.lines,
+        }
+    )
+    await db.execute(rollup)
+
+    group_keys = union_all(*(
+        select(
+            literal(day, models.SalesGroupOrders.day.type),
+            literal(group.value),
+            key,
+            literal(sign, Integer)
+        )
+        .select_from(models.OrderDetail)
+        .outerjoin(models.Product, models.Product.id_product == models.OrderDetail.id_product)
+        .where(models.OrderDetail.id_order == order.id_order)
+        .distinct()
+        for group, key in ORDER_GROUP_KEYS.items()
+    ))
+    await db.execute(_upsert_group_orders(db, group_keys))
+
+    daily = dialect_insert(db, models.SalesDaily).values(day=day, orders=sign, revenue=(order.total_amount or 0) * sign)
+    daily = daily.on_conflict_do_update(
+        index_elements=["day"],
+        set_={
+            "orders": models.SalesDaily.orders + daily.excluded.orders,
+            "revenue": models.SalesDaily.revenue + daily.excluded.revenue,
+        }
+    )
+    await db.execute(daily)
+
+
+async def apply_status_change(db: AsyncSession, order: models.Order, previous_status) -> None:
+    """Отмена заказа вычитает его из сводки, возврат из отмены — добавляет."""
+    was_counted, counted = is_counted(previous_status), is_counted(order.status)
+    if was_counted != counted:
+        await apply_order(db, order, 1 if counted else -1)
+
+
+async def rebuild_rollups(db: AsyncSession) -> None:
+    """Пересчитывает сводные таблицы с нуля по всем неотмененным заказам."""
+    await db.execute(delete(models.SalesRollup))
+    await db.execute(delete(models.SalesDaily))
+    await db.execute(delete(models.SalesGroupOrders))
+
+    counted = models.Order.status.in_(list(COUNTED_STATUSES))
+    # В SQLite CAST(... AS DATE) дает число, поэтому дата берется функцией date()
+    if db.get_bind().dialect.name == "sqlite":
+        day = func.date(models.Order.order_date)
+    else:
+        day = cast(models.Order.order_date, Date)
+    await db.execute(
+        dialect_insert(db, models.SalesRollup).from_select(
+            ["day", "id_product", "id_category", "id_country", "revenue", "units", "lines"],
+            select(
+                day,
+                models.OrderDetail.id_product,
+                func.max(models.Product.id_category),
+                func.max(models.Product.id_country),
+                func.sum(models.OrderDetail.amount),
+                func.sum(models.OrderDetail.quantity),
+                func.count()
+            )
+            .select_from(models.OrderDetail)
+            .join(models.Order, models.Order.id_order == models.OrderDetail.id_order)
+            .outerjoin(models.Product, models.Product.id_product == models.OrderDetail.id_product)
+            .where(counted)
+            .group_by(day, models.OrderDetail.id_product)
+        )
+    )
+    group_keys = union_all(*(
+        select(day, literal(group.value), key, func.count(distinct(models.OrderDetail.id_order)))
+        .select_from(models.OrderDetail)
+        .join(models.Order, models.Order.id_order == models.OrderDetail.id_order)
+        .outerjoin(models.Product, models.Product.id_product == models.OrderDetail.id_product)
+        .where(counted)
+        .group_by(day, key)
+        for group, key in ORDER_GROUP_KEYS.items()
+    ))
+    await db.execute(_upsert_group_orders(db, group_keys))
+    await db.execute(
+        dialect_insert(db, models.SalesDaily).from_select(
+            ["day", "orders", "revenue"],
+            select(day, func.count(), func.coalesce(func.sum(models.Order.total_amount), 0))
+            .where(counted)
+            .group_by(day)
+        )
+    )
+    await db.commit()
+
+
+def _date_range(stmt, column, filters: schemas.SalesFilter):
+    if filters.date_from is not None:
+        stmt = stmt.where(column >= filters.date_from)
+    if filters.date_to is not None:
+        stmt = stmt.where(column < filters.date_to)
+    return stmt
+
+
+async def _labels(db: AsyncSession, group: schemas.SalesGroupEnum, keys: list) -> dict:
+    if group == schemas.SalesGroupEnum.CATEGORY:
+        return {category.id_category: category.name_category for category in await reference.get_categories(db)}
+    if group == schemas.SalesGroupEnum.COUNTRY:
+        return {country.id_country: country.name_country for country in await reference.get_countries(db)}
+    if group == schemas.SalesGroupEnum.PRODUCT and keys:
+        result = await db.execute(
+            select(models.Product.id_product, models.Product.name).where(models.Product.id_product.in_(keys))
+        )
+        return dict(result.all())
+    return {}
+
+
+GROUP_COLUMNS = {
+    schemas.SalesGroupEnum.DAY: models.SalesRollup.day,
+    schemas.SalesGroupEnum.CATEGORY: models.SalesRollup.id_category,
+    schemas.SalesGroupEnum.COUNTRY: models.SalesRollup.id_country,
+    schemas.SalesGroupEnum.PRODUCT: models.SalesRollup.id_product,
+}
+
+
+async def sales_report(
+    db: AsyncSession,
+    group: schemas.SalesGroupEnum,
+    filters: schemas.SalesFilter,
+    order_by: schemas.SalesMetricEnum | None = None,
+    limit: int | None = None
+) -> list[schemas.SalesBucket]:
+    """
+    Выручка, количество и число заказов по срезу. Читает только сводные таблицы:
+    стоимость пропорциональна числу корзин (день x товар), а не строкам заказов.
+    """
+    key = GROUP_COLUMNS[group]
+    revenue = func.sum(models.SalesRollup.revenue).label("revenue")
+    units = func.sum(models.SalesRollup.units).label("units")
+    lines = func.sum(models.SalesRollup.lines)
+    # Полностью отмененные корзины остаются в сводке нулевыми строками
+    stmt = select(key, revenue, units, lines).group_by(key).having(lines > 0)
+    stmt = _date_range(stmt, models.SalesRollup.day, filters)
+    if order_by is not None:
+        stmt = stmt.order_by((revenue if order_by == schemas.SalesMetricEnum.REVENUE else units).desc(), key)
+    else:
+        stmt = stmt.order_by(key)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = (await db.execute(stmt)).all()
+
+    # Заказ может содержать несколько товаров одной группы: число заказов берется
+    # из дневного итога или из sales_group_orders, а не из суммы строк
+    if group == schemas.SalesGroupEnum.DAY:
+        counts = _date_range(select(models.SalesDaily.day, models.SalesDaily.orders), models.SalesDaily.day, filters)
+    else:
+        counts = _date_range(
+            select(models.SalesGroupOrders.key, func.sum(models.SalesGroupOrders.orders))
+            .where(models.SalesGroupOrders.dimension == group.value)
+            .group_by(models.SalesGroupOrders.key),
+            models.SalesGroupOrders.day,
+            filters
+        )
+    orders = dict((await db.execute(counts)).all())
+
+    labels = await _labels(db, group, [row[0] for row in rows])
+    return [
+        schemas.SalesBucket(
+            key=str(bucket),
+            label=labels.get(bucket),
+            revenue=bucket_revenue or 0.0,
+            units=bucket_units or 0.0,
+            orders=orders.get(0 if bucket is None else bucket, 0)
+        )
+        for bucket, bucket_revenue, bucket_units, _ in rows
+    ]
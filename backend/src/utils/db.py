@@ -1,24 +1,140 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from backend.src.config import Config
 from typing import AsyncGenerator
 
-engine = create_async_engine(
-    Config.SQLALCHEMY_DATABASE_URI.replace("sqlite:///", "sqlite+aiosqlite:///"),
-    echo=True,
-    future=True
-)
+# Асинхронные драйверы для синхронных схем URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Подставляет асинхронный драйвер, если в URL указан синхронный."""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def sqlite_read_only_url(url: str) -> str:
+    """URL того же файла SQLite, открываемого только для чтения (mode=ro)."""
+    db_url = make_url(async_database_url(url))
+    return str(db_url.set(
+        database=f"file:{db_url.database}",
+        query={**db_url.query, "mode": "ro", "uri": "true"}
+    ))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={Config.SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+
+def _set_sqlite_read_pragmas(dbapi_connection, connection_record):
+    # journal_mode/synchronous задает писатель; читателю они не нужны
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={Config.SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+
+def create_engine(url: str | None = None, **overrides) -> AsyncEngine:
+    """
+    Создает асинхронный движок по настройкам Config. Для файловой SQLite
+    включает пул соединений (по умолчанию aiosqlite открывает соединение
+    на каждую сессию) и PRAGMA из Config; логирование SQL выключено,
+    если не задано SQLALCHEMY_ECHO.
+    """
+    db_url = make_url(async_database_url(url or Config.SQLALCHEMY_DATABASE_URI))
+    is_sqlite = db_url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and db_url.database in (None, "", ":memory:")
+
+    options = {"echo": Config.SQLALCHEMY_ECHO, "future": True}
+    if not in_memory:
+        options.update(
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            pool_pre_ping=Config.DB_POOL_PRE_PING,
+        )
+        if is_sqlite:
+            options["poolclass"] = AsyncAdaptedQueuePool
+    options.update(overrides)
+
+    read_only = db_url.query.get("mode") == "ro"
+    new_engine = create_async_engine(db_url, **options)
+    if is_sqlite:
+        pragmas = _set_sqlite_read_pragmas if read_only else _set_sqlite_pragmas
+        event.listen(new_engine.sync_engine, "connect", pragmas)
+    return new_engine
+
+
+def _is_sqlite_file(url: str) -> bool:
+    db_url = make_url(async_database_url(url))
+    return db_url.get_backend_name() == "sqlite" and db_url.database not in (None, "", ":memory:")
+
+
+# Писатель. SQLite допускает одну пишущую транзакцию, поэтому для нее
+# пул писателя — одно соединение: записи выстраиваются в очередь пула,
+# а не упираются в "database is locked".
+if _is_sqlite_file(Config.SQLALCHEMY_DATABASE_URI):
+    engine = create_engine(pool_size=1, max_overflow=0)
+else:
+    engine = create_engine()
+
+# Читатели: реплика из DATABASE_READ_URL или тот же файл SQLite в режиме mode=ro
+if Config.SQLALCHEMY_READ_DATABASE_URI:
+    read_engine = create_engine(Config.SQLALCHEMY_READ_DATABASE_URI, pool_size=Config.DB_READ_POOL_SIZE)
+elif _is_sqlite_file(Config.SQLALCHEMY_DATABASE_URI):
+    read_engine = create_engine(
+        sqlite_read_only_url(Config.SQLALCHEMY_DATABASE_URI),
+        pool_size=Config.DB_READ_POOL_SIZE
+    )
+else:
+    read_engine = engine
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+AsyncReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+)
+
 Base = declarative_base()
 
-async def get_db() -> AsyncGenerator:
+async def get_write_db() -> AsyncGenerator:
     async with AsyncSessionLocal() as db:
         try:
             yield db
         finally:
-            await db.close()
\ No newline at end of file
+            await db.close()
+
+async def get_read_db() -> AsyncGenerator:
+    async with AsyncReadSessionLocal() as db:
+        try:
+            yield db
+        finally:
+            await db.close()
+
+# Исторический алиас: сессия на запись
+get_db = get_write_db
+
+def dialect_insert(db: AsyncSession, model):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущего подключения."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.src import models, schemas
+from backend.src.config import Config
+from backend.src.utils.db import AsyncReadSessionLocal
+
+InitialLoader = Callable[[AsyncSession], Awaitable[list[schemas.OrderEvent]]]
+
+
+class Subscriber:
+    """Подписчик — только ограниченная очередь: простаивающее соединение ничего не стоит."""
+
+    def __init__(self, topic: str, buffer_size: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+
+    def push(self, item) -> None:
+        # Медленный клиент теряет самые старые события, но всегда получит последний статус
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+
+class EventBroker:
+    """
+    Pub/sub внутри процесса. При нескольких воркерах каждый видит только
+    изменения, сделанные им самим; для этого случая нужен внешний брокер.
+    """
+
+    def __init__(self, buffer_size: int, max_subscribers: int):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._topics: dict[str, set[Subscriber]] = {}
+        self._count = 0
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+
+    def ensure_capacity(self) -> None:
+        if self._count >= self.max_subscribers:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Слишком много подписок на события")
+
+    def subscribe(self, topic: str) -> Subscriber:
+        subscriber = Subscriber(topic, self.buffer_size)
+        self._topics.setdefault(topic, set()).add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._topics.get(subscriber.topic)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._topics[subscriber.topic]
+        self._count -= 1
+        self.dropped += subscriber.dropped
+
+    def publish(self, topics: list[str], event: schemas.OrderEvent) -> None:
+        item = (next(self._ids), event.model_dump_json())
+        for topic in topics:
+            for subscriber in self._topics.get(topic, ()):
+                subscriber.push(item)
+        self.published += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "topics": len(self._topics),
+            "published": self.published,
+            "dropped": self.dropped + sum(s.dropped for subs in self._topics.values() for s in subs),
+        }
+
+
+order_events = EventBroker(Config.SSE_BUFFER_SIZE, Config.SSE_MAX_SUBSCRIBERS)
+
+
+def order_topic(id_order: int) -> str:
+    return f"order:{id_order}"
+
+
+def user_topic(id_user: int) -> str:
+    return f"user:{id_user}"
+
+
+def order_event(order: models.Order) -> schemas.OrderEvent:
+    return schemas.OrderEvent(
+        id_order=order.id_order,
+        id_user=order.id_user,
+        status=order.status,
+        total_amount=order.total_amount
+    )
+
+
+def publish_order(order: models.Order) -> None:
+    order_events.publish([order_topic(order.id_order), user_topic(order.id_user)], order_event(order))
+
+
+async def _stream(topic: str, load_initial: InitialLoader | None) -> AsyncIterator[bytes]:
+    # Подписка до чтения текущего состояния: изменение между ними не потеряется
+    subscriber = order_events.subscribe(topic)
+    try:
+        initial = []
+        if load_initial is not None:
+            async with AsyncReadSessionLocal() as db:
+                initial = await load_initial(db)
+        yield f"retry: {Config.SSE_RETRY_MS}\n\n".encode()
+        for event in initial:
+            yield f"event: order\ndata: {event.model_dump_json()}\n\n".encode()
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), timeout=Config.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Комментарий SSE держит соединение открытым через прокси
+                yield b": ping\n\n"
+                continue
+            event_id, data = item
+            yield f"id: {event_id}\nevent: order\ndata: {data}\n\n".encode()
+    finally:
+        order_events.unsubscribe(subscriber)
+
+
+def event_stream_response(topic: str, load_initial: InitialLoader | None = None) -> StreamingResponse:
+    """
+    SSE-ответ: текущее состояние, затем изменения и периодический heartbeat.
+    Зависимости запроса к этому моменту уже закрыты, поэтому начальное
+    состояние читается собственной сессией внутри потока.
+    """
+    order_events.ensure_capacity()
+    return StreamingResponse(
+        _stream(topic, load_initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import AsyncIterator, Callable, Iterable, List
+
+from fastapi.responses import StreamingResponse
+
+from backend.src import schemas
+from backend.src.utils.db import AsyncReadSessionLocal
+
+# Сколько строк за раз читается из курсора БД
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    schemas.ExportFormatEnum.NDJSON: "application/x-ndjson",
+    schemas.ExportFormatEnum.CSV: "text/csv; charset=utf-8",
+}
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+async def iter_partitions(stmt) -> AsyncIterator[List[dict]]:
+    """
+    Читает результат запроса порциями по EXPORT_BATCH_SIZE через серверный
+    курсор. Сессия открывается здесь, а не в зависимости: зависимости
+    с yield закрываются до того, как StreamingResponse начнет отдавать тело.
+    """
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.mappings().partitions():
+            yield [{key: _plain(value) for key, value in row.items()} for row in partition]
+
+
+def _encode_ndjson(records: Iterable[dict]) -> str:
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+
+def _encode_csv(records: Iterable[dict], fieldnames: List[str], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+def export_response(
+    partitions: AsyncIterator[List[dict]],
+    export_format: schemas.ExportFormatEnum,
+    fieldnames: List[str],
+    filename: str,
+    group: Callable[[AsyncIterator[List[dict]]], AsyncIterator[List[dict]]] | None = None
+) -> StreamingResponse:
+    """
+    Отдает выгрузку потоком: память не зависит от числа строк.
+    CSV пишется плоско, по строке на запись; для NDJSON строки можно
+    предварительно сгруппировать во вложенные объекты через group.
+    """
+    async def body():
+        if export_format == schemas.ExportFormatEnum.CSV:
+            header = True
+            async for records in partitions:
+                yield _encode_csv(records, fieldnames, header)
+                header = False
+            if header:
+                yield _encode_csv([], fieldnames, header)
+        else:
+            source = group(partitions) if group else partitions
+            async for records in source:
+                yield _encode_ndjson(records)
+
+    extension = "csv" if export_format == schemas.ExportFormatEnum.CSV else "ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
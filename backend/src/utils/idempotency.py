@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models
+from backend.src.config import Config
+from backend.src.utils.db import dialect_insert
+
+# Запросы с одинаковым ключом внутри процесса ждут первый, не обращаясь к БД
+_in_flight: dict[tuple[int, str], asyncio.Event] = {}
+_last_purge = 0.0
+
+
+def request_fingerprint(payload: BaseModel) -> str:
+    """Хэш тела запроса: повтор с тем же ключом, но другим телом — ошибка клиента."""
+    canonical = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _replay(record: models.IdempotencyKey) -> Response:
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+async def _purge_expired(db: AsyncSession) -> None:
+    global _last_purge
+    if time.monotonic() - _last_purge < Config.IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = time.monotonic()
+    cutoff = datetime.now() - timedelta(seconds=Config.IDEMPOTENCY_TTL_SECONDS)
+    await db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < cutoff))
+
+
+async def _run_once(
+    db: AsyncSession,
+    id_user: int,
+    key: str,
+    request_hash: str,
+    produce: Callable[[], Awaitable[tuple[int, bytes]]]
+) -> Response:
+    key_filter = (models.IdempotencyKey.id_user == id_user, models.IdempotencyKey.key == key)
+    deadline = time.monotonic() + Config.IDEMPOTENCY_WAIT_SECONDS
+
+    while True:
+        result = await db.execute(
+            select(models.IdempotencyKey).where(*key_filter).execution_options(populate_existing=True)
+        )
+        record = result.scalars().first()
+        now = datetime.now()
+        expired = record is not None and record.created_at < now - timedelta(seconds=Config.IDEMPOTENCY_TTL_SECONDS)
+        abandoned = (
+            record is not None and record.status_code is None
+            and record.created_at < now - timedelta(seconds=Config.IDEMPOTENCY_LEASE_SECONDS)
+        )
+
+        if abandoned:
+            # Заявку оставил упавший процесс: перехватываем условным UPDATE,
+            # из нескольких претендентов его выполнит только один
+            claimed_at = now
+            claim = await db.execute(
+                update(models.IdempotencyKey)
+                .where(*key_filter, models.IdempotencyKey.status_code.is_(None), models.IdempotencyKey.created_at == record.created_at)
+                .values(request_hash=request_hash, created_at=claimed_at)
+            )
+            await db.commit()
+            if claim.rowcount:
+                break
+        elif record is not None and not expired:
+            if record.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key уже использован для другого запроса"
+                )
+            if record.status_code is not None:
+                return _replay(record)
+        else:
+            if expired:
+                await db.execute(delete(models.IdempotencyKey).where(*key_filter))
+            await _purge_expired(db)
+            claimed_at = now
+            claim = await db.execute(
+                dialect_insert(db, models.IdempotencyKey)
+                .values(id_user=id_user, key=key, request_hash=request_hash, created_at=claimed_at)
+                .on_conflict_do_nothing()
+            )
+            await db.commit()
+            if claim.rowcount:
+                break
+
+        # Ключ занят запросом в другом процессе: отпускаем соединение и ждем
+        await db.rollback()
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Запрос с этим Idempotency-Key еще выполняется",
+                headers={"Retry-After": "1"}
+            )
+        await asyncio.sleep(0.1)
+
+    # Своя заявка узнается по времени захвата: после перехвата оно другое
+    owned = (*key_filter, models.IdempotencyKey.created_at == claimed_at)
+    try:
+        status_code, body = await produce()
+        saved = await db.execute(
+            update(models.IdempotencyKey).where(*owned).values(status_code=status_code, response_body=body)
+        )
+        if not saved.rowcount:
+            # Запрос шел дольше срока заявки, и ее перехватил повтор: результат откатывается
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Запрос с этим Idempotency-Key выполнен повторным запросом",
+                headers={"Retry-After": "1"}
+            )
+        await db.commit()
+    except BaseException:
+        # Ключ освобождается, чтобы повтор мог выполнить запрос заново
+        await db.rollback()
+        await db.execute(delete(models.IdempotencyKey).where(*owned))
+        await db.commit()
+        raise
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+async def idempotent_response(
+    db: AsyncSession,
+    id_user: int,
+    key: str,
+    request_hash: str,
+    produce: Callable[[], Awaitable[tuple[int, bytes]]]
+) -> Response:
+    """
+    Выполняет produce() не более одного раза на (пользователь, ключ) за время
+    IDEMPOTENCY_TTL_SECONDS. produce не делает commit: результат операции и
+    сохраненный ответ фиксируются одной транзакцией. Повторы получают
+    сохраненные байты ответа, параллельные дубликаты ждут первый запрос;
+    незавершенная заявка старше IDEMPOTENCY_LEASE_SECONDS перехватывается.
+    """
+    scope = (id_user, key)
+    while (event := _in_flight.get(scope)) is not None:
+        await event.wait()
+
+    event = _in_flight[scope] = asyncio.Event()
+    try:
+        return await _run_once(db, id_user, key, request_hash, produce)
+    finally:
+        del _in_flight[scope]
+        event.set()
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import and_, update
+from sqlalchemy.future import select
+
+from backend.src import models
+from backend.src.config import Config
+from backend.src.utils.db import AsyncSessionLocal
+from backend.src.utils.search import product_names
+from backend.src.utils.snapshot import catalog_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def orderable():
+    """
+    Товар можно положить в корзину и заказать. Дата проверяется вместе с флагом:
+    между запусками задачи просроченный товар еще может быть не помечен.
+    """
+    return and_(models.Product.is_expired.is_(False), models.Product.expiration_date >= date.today())
+
+
+def is_expired_on(expiration_date: date | None) -> bool:
+    return expiration_date is not None and expiration_date < date.today()
+
+
+async def expire_products(batch_size: int) -> int:
+    """
+    Помечает просроченные товары пачками по индексу (is_expired, expiration_date);
+    каждая пачка — отдельная короткая транзакция, чтобы не держать блокировку записи.
+    """
+    marked = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Product.id_product)
+                .where(models.Product.is_expired.is_(False), models.Product.expiration_date < date.today())
+                .limit(batch_size)
+            )
+            ids = list(result.scalars())
+            if not ids:
+                return marked
+            await db.execute(
+                update(models.Product).where(models.Product.id_product.in_(ids)).values(is_expired=True)
+            )
+            await db.commit()
+        catalog_snapshot.invalidate_products(ids)
+        product_names.invalidate()
+        marked += len(ids)
+        if len(ids) < batch_size:
+            return marked
+
+
+class ExpirationJob:
+    """Периодическая задача, запускаемая из lifespan приложения."""
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.runs = 0
+        self.marked = 0
+        self.last_run: datetime | None = None
+        self.last_error: str | None = None
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> int:
+        marked = await expire_products(self.batch_size)
+        self.runs += 1
+        self.marked += marked
+        self.last_run = datetime.now()
+        return marked
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+                self.last_error = None
+            except Exception as error:
+                self.last_error = repr(error)
+                logger.exception("Ошибка задачи снятия просроченных товаров")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None,
+            "runs": self.runs,
+            "marked": self.marked,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+expiration_job = ExpirationJob(Config.EXPIRATION_JOB_INTERVAL_SECONDS, Config.EXPIRATION_JOB_BATCH_SIZE)
@@ -0,0 +1,40 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import Integer
+from sqlalchemy.types import TypeDecorator
+
+CENT = Decimal("0.01")
+
+
+def to_money(value) -> Decimal:
+    """Сумма в рублях, округленная до копеек (половина — вверх)."""
+    if not isinstance(value, Decimal):
+        # str() сохраняет десятичную запись float: 0.1 -> Decimal("0.1")
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class Money(TypeDecorator):
+    """
+    Денежная сумма: в БД — целое число копеек (точные SUM и сравнения в любом
+    диалекте, включая SQLite), в Python — Decimal в рублях.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int(to_money(value) * 100)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, float):
+            # Дробное значение — сумма в рублях из базы до перехода на копейки (колонка REAL);
+            # int() молча превратил бы 10.1 ₽ в 0.10 ₽
+            raise ValueError(
+                f"Денежная колонка содержит значение в старом формате ({value!r}); "
+                "переведите суммы в копейки: python -m backend.src.utils.upgrade"
+            )
+        return Decimal(int(value)).scaleb(-2)
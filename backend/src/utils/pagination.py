@@ -0,0 +1,263 @@
+import base64
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Float, Integer, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models, schemas
+from backend.src.utils.money import Money
+from backend.src.utils.serialization import row_records, validate_records
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Колонки ключа сортировки (последняя всегда уникальна) и направление
+PRODUCT_SORT_KEYS = {
+    schemas.ProductSortEnum.ID_ASC: ((models.Product.id_product,), False),
+    schemas.ProductSortEnum.ID_DESC: ((models.Product.id_product,), True),
+    schemas.ProductSortEnum.PRICE_ASC: ((models.Product.price_per_unit, models.Product.id_product), False),
+    schemas.ProductSortEnum.PRICE_DESC: ((models.Product.price_per_unit, models.Product.id_product), True),
+    schemas.ProductSortEnum.RATING_DESC: ((models.Product.rating_average, models.Product.id_product), True),
+}
+
+
+def encode_cursor(sort: str, values: list) -> str:
+    """Кодирует значения ключа последней строки страницы в непрозрачный курсор."""
+    raw = json.dumps({"s": sort, "k": values}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _key_value(column, value):
+    """
+    Приводит значение из курсора к типу колонки ключа. Курсор приходит от клиента:
+    без проверки строка в цене или список в id доходили бы до драйвера БД.
+    """
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(column.type, Money):
+        if not isinstance(value, (str, int, float)):
+            raise ValueError(value)
+        value = Decimal(str(value))
+        if not value.is_finite():
+            raise ValueError(value)
+        return value
+    if isinstance(column.type, Integer):
+        # Вне 64 бит драйвер SQLite падает с OverflowError
+        if not isinstance(value, int) or not -2**63 <= value < 2**63:
+            raise ValueError(value)
+        return value
+    if isinstance(column.type, Float):
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(value)
+        return float(value)
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    raise ValueError(value)
+
+
+def decode_cursor(cursor: str, sort: str, columns: tuple) -> list:
+    """Декодирует курсор, проверяет, что он выдан для той же сортировки, и типизирует ключ."""
+    invalid_cursor = HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise invalid_cursor
+    if not isinstance(payload, dict) or payload.get("s") != sort:
+        raise invalid_cursor
+    values = payload.get("k")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise invalid_cursor
+    try:
+        return [_key_value(column, value) for column, value in zip(columns, values)]
+    except (TypeError, ValueError, ArithmeticError):
+        raise invalid_cursor
+
+
+def apply_keyset(stmt, columns: tuple, descending: bool, after: list | None):
+    """Добавляет к запросу условие "после курсора" и порядок по ключу."""
+    if after is not None:
+        if len(columns) == 1:
+            key, bound = columns[0], after[0]
+        else:
+            # Значения курсора связываются с типами колонок (Money, даты)
+            key = tuple_(*columns)
+            bound = tuple_(*(literal(value, column.type) for value, column in zip(after, columns)))
+        stmt = stmt.where(key < bound if descending else key > bound)
+    return stmt.order_by(*(column.desc() if descending else column.asc() for column in columns))
+
+
+def apply_product_filters(stmt, filters: schemas.ProductFilter):
+    if not filters.include_expired:
+        # Флаг ставит фоновая задача; дата отсекает товары, просроченные после ее прохода
+        stmt = stmt.where(models.Product.is_expired.is_(False), models.Product.expiration_date >= date.today())
+    if filters.id_category is not None:
+        stmt = stmt.where(models.Product.id_category == filters.id_category)
+    if filters.id_country is not None:
+        stmt = stmt.where(models.Product.id_country == filters.id_country)
+    if filters.min_price is not None:
+        stmt = stmt.where(models.Product.price_per_unit >= filters.min_price)
+    if filters.max_price is not None:
+        stmt = stmt.where(models.Product.price_per_unit <= filters.max_price)
+    if filters.unit_type is not None:
+        stmt = stmt.where(models.Product.unit_type == filters.unit_type)
+    return stmt
+
+
+PRODUCT_COLUMNS = tuple(
+    getattr(models.Product, field)
+    for field in (
+        "id_product", "name", "price_per_unit", "unit_type", "expiration_date",
+        "rating_count", "rating_average", "is_expired"
+    )
+)
+
+
+def _product_record(record: dict) -> dict:
+    record["country"] = {"id_country": record.pop("id_country"), "name_country": record.pop("name_country")}
+    record["category"] = {"id_category": record.pop("id_category"), "name_category": record.pop("name_category")}
+    return record
+
+
+async def fetch_products_page(
+    db: AsyncSession,
+    filters: schemas.ProductFilter,
+    sort: schemas.ProductSortEnum = schemas.ProductSortEnum.ID_ASC,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None
+) -> tuple[list[schemas.Product], str | None]:
+    """
+    Возвращает товары страницы и курсор следующей; стоимость не зависит от номера страницы.
+    Страна и категория читаются тем же запросом, модели строятся из строк без объектов ORM.
+    """
+    columns, descending = PRODUCT_SORT_KEYS[sort]
+    after = decode_cursor(cursor, sort.value, columns) if cursor else None
+
+    stmt = (
+        select(
+            *PRODUCT_COLUMNS,
+            models.Country.id_country, models.Country.name_country,
+            models.Category.id_category, models.Category.name_category
+        )
+        .join(models.Country, models.Country.id_country == models.Product.id_country)
+        .join(models.Category, models.Category.id_category == models.Product.id_category)
+    )
+    stmt = apply_product_filters(stmt, filters)
+    stmt = apply_keyset(stmt, columns, descending, after).limit(limit + 1)
+
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort.value, [getattr(last, column.key) for column in columns])
+    records = [_product_record(record) for record in row_records(result.keys(), rows)]
+    return validate_records(schemas.Product, records), next_cursor
+
+
+# История заказов: сначала новые
+ORDER_SORT_KEY = (models.Order.order_date, models.Order.id_order)
+ORDER_LIST_COLUMNS = tuple(
+    getattr(models.Order, field) for field in ("id_order", "id_user", "order_date", "total_amount", "status")
+)
+ORDER_DETAIL_COLUMNS = tuple(
+    getattr(models.OrderDetail, field)
+    for field in ("id_order_detail", "id_order", "id_product", "quantity", "unit_type", "price", "amount")
+)
+
+
+async def get_orders_page(
+    db: AsyncSession,
+    filters: schemas.OrderFilter,
+    id_user: int | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    expand: schemas.OrderExpandEnum | None = None
+) -> schemas.OrderPage:
+    """
+    Страница заказов по индексам (id_user|status, order_date, id_order).
+    Читаются только колонки, модели строятся из строк без объектов ORM;
+    детали заказов загружаются одним запросом только при expand=items.
+    """
+    after = decode_cursor(cursor, "orders", ORDER_SORT_KEY) if cursor else None
+
+    stmt = select(*ORDER_LIST_COLUMNS)
+    if id_user is not None:
+        stmt = stmt.where(models.Order.id_user == id_user)
+    if filters.status is not None:
+        stmt = stmt.where(models.Order.status == filters.status)
+    if filters.date_from is not None:
+        stmt = stmt.where(models.Order.order_date >= filters.date_from)
+    if filters.date_to is not None:
+        stmt = stmt.where(models.Order.order_date < filters.date_to)
+    stmt = apply_keyset(stmt, ORDER_SORT_KEY, True, after).limit(limit + 1)
+
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor("orders", [last.order_date.isoformat(), last.id_order])
+
+    records = row_records(result.keys(), rows)
+    if expand != schemas.OrderExpandEnum.ITEMS:
+        return schemas.OrderPage(items=validate_records(schemas.OrderListItem, records), next_cursor=next_cursor)
+
+    details: dict[int, list] = {record["id_order"]: [] for record in records}
+    if details:
+        detail_result = await db.execute(
+            select(*ORDER_DETAIL_COLUMNS)
+            .where(models.OrderDetail.id_order.in_(list(details)))
+            .order_by(models.OrderDetail.id_order_detail)
+        )
+        for detail in row_records(detail_result.keys(), detail_result.all()):
+            details[detail["id_order"]].append(detail)
+    for record in records:
+        record["order_details"] = details[record["id_order"]]
+    items = validate_records(schemas.OrderListItem, records)
+    return schemas.OrderPage(items=items, next_cursor=next_cursor)
+
+
+# Ленты отзывов: id_review растет вместе с created_at, поэтому "новые"
+# сортируются по первичному ключу и используют индексы (id_product|id_user, id_review)
+REVIEW_SORT_KEYS = {
+    schemas.ReviewSortEnum.NEWEST: ((models.Review.id_review,), True),
+    schemas.ReviewSortEnum.RATING_DESC: ((models.Review.rating, models.Review.id_review), True),
+}
+
+
+async def get_reviews_page(
+    db: AsyncSession,
+    id_product: int | None = None,
+    id_user: int | None = None,
+    sort: schemas.ReviewSortEnum = schemas.ReviewSortEnum.NEWEST,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None
+) -> schemas.ReviewPage:
+    columns, descending = REVIEW_SORT_KEYS[sort]
+    after = decode_cursor(cursor, "reviews:" + sort.value, columns) if cursor else None
+
+    stmt = select(*models.Review.__table__.columns)
+    if id_product is not None:
+        stmt = stmt.where(models.Review.id_product == id_product)
+    if id_user is not None:
+        stmt = stmt.where(models.Review.id_user == id_user)
+    stmt = apply_keyset(stmt, columns, descending, after).limit(limit + 1)
+
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor("reviews:" + sort.value, [getattr(last, column.key) for column in columns])
+    return schemas.ReviewPage(items=validate_records(schemas.Review, row_records(result.keys(), rows)), next_cursor=next_cursor)
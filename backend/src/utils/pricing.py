@@ -0,0 +1,100 @@
+import asyncio
+from decimal import ROUND_HALF_UP, Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, cast, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models, schemas
+from backend.src.utils.money import to_money
+
+# Шаг количества: весовой товар — до грамма, штучный — только целые штуки
+QUANTITY_STEPS = {
+    schemas.UnitType.KG: Decimal("0.001"),
+    schemas.UnitType.PIECE: Decimal("1"),
+}
+
+
+def normalize_quantity(unit_type: schemas.UnitType, quantity, id_product: int) -> Decimal:
+    value = Decimal(str(quantity))
+    step = QUANTITY_STEPS[schemas.UnitType(unit_type)]
+    normalized = value.quantize(step, rounding=ROUND_HALF_UP)
+    if unit_type == schemas.UnitType.PIECE and normalized != value:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Штучный товар с ID {id_product} заказывается целым количеством"
+        )
+    if normalized <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Количество товара с ID {id_product} должно быть положительным"
+        )
+    return normalized
+
+
+def price_order(
+    products: dict[int, models.Product],
+    lines: list[schemas.OrderDetailCreate]
+) -> tuple[list[models.OrderDetail], Decimal]:
+    """
+    Один проход по строкам заказа в Decimal: количество округляется по правилу
+    единицы измерения, сумма строки — до копеек, итог — точная сумма строк.
+    """
+    details, total = [], Decimal("0.00")
+    for line in lines:
+        product = products.get(line.id_product)
+        if product is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Товар с ID {line.id_product} не найден")
+        quantity = normalize_quantity(product.unit_type, line.quantity, line.id_product)
+        amount = to_money(quantity * product.price_per_unit)
+        details.append(models.OrderDetail(
+            id_product=line.id_product,
+            quantity=float(quantity),
+            unit_type=product.unit_type,
+            price=product.price_per_unit,
+            amount=amount
+        ))
+        total += amount
+    return details, total
+
+
+async def retotal_orders(db: AsyncSession) -> int:
+    """
+    Пересчитывает суммы строк и итоги всех заказов двумя UPDATE без загрузки
+    заказов в ORM. Цены хранятся в копейках, поэтому ROUND дает целые копейки.
+    """
+    details, orders = models.OrderDetail.__table__, models.Order.__table__
+    await db.execute(
+        update(details).values(amount=cast(func.round(details.c.quantity * details.c.price), Integer))
+    )
+    line_total = (
+        select(func.coalesce(func.sum(details.c.amount), 0))
+        .where(details.c.id_order == orders.c.id_order)
+        .scalar_subquery()
+    )
+    result = await db.execute(update(orders).values(total_amount=line_total))
+    await db.commit()
+    return result.rowcount
+
+
+async def _main() -> None:
+    from backend.src.utils.db import AsyncSessionLocal, engine
+    from backend.src.utils.upgrade import schema_changes
+
+    async with engine.connect() as conn:
+        changes = await conn.run_sync(schema_changes)
+    if any(reason.startswith("рубли") for reasons in changes.values() for reason in reasons):
+        # Пересчет по колонкам в рублях записал бы итоги в неверном масштабе
+        await engine.dispose()
+        raise SystemExit("Суммы в базе еще в рублях: сначала python -m backend.src.utils.upgrade")
+
+    async with AsyncSessionLocal() as db:
+        updated = await retotal_orders(db)
+    await engine.dispose()
+    print(f"Пересчитаны итоги {updated} заказов")
+
+
+if __name__ == "__main__":
+    # python -m backend.src.utils.pricing
+    asyncio.run(_main())
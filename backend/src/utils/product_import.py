@@ -0,0 +1,181 @@
+import csv
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models, schemas
+from backend.src.config import Config
+from backend.src.utils import reference
+from backend.src.utils.db import dialect_insert
+from backend.src.utils.inventory import is_expired_on
+
+PRODUCT_FIELDS = ("name", "price_per_unit", "unit_type", "expiration_date", "id_country", "id_category")
+
+products_table = models.Product.__table__
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], import_format: schemas.ExportFormatEnum) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    Разбирает тело запроса по мере поступления: (номер строки, запись или текст
+    ошибки). Записи CSV не должны содержать переводов строк внутри полей.
+    """
+    header = None
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        if import_format == schemas.ExportFormatEnum.NDJSON:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, "Некорректный JSON"
+                continue
+            yield line_number, record if isinstance(record, dict) else "Ожидался JSON-объект"
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_number, f"Ожидалось {len(header)} полей, получено {len(values)}"
+                continue
+            # Пустые ячейки CSV означают отсутствие значения
+            yield line_number, {key: value for key, value in zip(header, values) if value != ""}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+async def import_products(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    import_format: schemas.ExportFormatEnum
+) -> schemas.ProductImportReport:
+    """
+    Проверяет все строки (внешние ключи — по множествам ID, загруженным один
+    раз), затем пишет их одной транзакцией пачками executemany:
+    полные строки — upsert по id_product, частичные строки с id_product — UPDATE.
+    Сессия не используется, пока тело не прочитано: иначе единственное
+    соединение писателя SQLite было бы занято на все время загрузки.
+    """
+    errors: list[schemas.ProductImportError] = []
+    rows: list[tuple[int, schemas.ProductImportRow]] = []
+    async for line_number, record in iter_records(chunks, import_format):
+        if len(rows) >= Config.PRODUCT_IMPORT_MAX_ROWS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Не более {Config.PRODUCT_IMPORT_MAX_ROWS} строк за один импорт"
+            )
+        if isinstance(record, str):
+            errors.append(schemas.ProductImportError(row=line_number, detail=record))
+            continue
+        try:
+            row = schemas.ProductImportRow.model_validate(record)
+        except ValidationError as error:
+            errors.append(schemas.ProductImportError(row=line_number, detail=_validation_message(error)))
+            continue
+
+        provided = row.model_fields_set - {"id_product"}
+        # Явный null допустим в схеме строки, но все поля товара в БД обязательны
+        nulls = sorted(field for field in provided if getattr(row, field) is None)
+        if row.id_product is None and provided != set(PRODUCT_FIELDS):
+            missing = ", ".join(sorted(set(PRODUCT_FIELDS) - provided))
+            errors.append(schemas.ProductImportError(row=line_number, detail=f"Для нового товара не хватает полей: {missing}"))
+        elif not provided:
+            errors.append(schemas.ProductImportError(row=line_number, detail="Нет данных для обновления"))
+        elif nulls:
+            errors.append(schemas.ProductImportError(row=line_number, detail=f"Поля не могут быть пустыми: {', '.join(nulls)}"))
+        else:
+            rows.append((line_number, row))
+
+    category_ids = {category.id_category for category in await reference.get_categories(db)}
+    country_ids = {country.id_country for country in await reference.get_countries(db)}
+    checked = []
+    for line_number, row in rows:
+        if row.id_category is not None and row.id_category not in category_ids:
+            errors.append(schemas.ProductImportError(row=line_number, detail=f"Категория с ID {row.id_category} не найдена"))
+        elif row.id_country is not None and row.id_country not in country_ids:
+            errors.append(schemas.ProductImportError(row=line_number, detail=f"Страна с ID {row.id_country} не найдена"))
+        else:
+            checked.append((line_number, row))
+    rows = checked
+
+    existing_ids = set()
+    requested_ids = [row.id_product for _, row in rows if row.id_product is not None]
+    for start in range(0, len(requested_ids), Config.PRODUCT_IMPORT_BATCH_SIZE):
+        result = await db.execute(
+            select(models.Product.id_product).where(
+                models.Product.id_product.in_(requested_ids[start:start + Config.PRODUCT_IMPORT_BATCH_SIZE])
+            )
+        )
+        existing_ids.update(result.scalars())
+
+    inserts, upserts = [], []
+    inserted = updated = 0
+    # Частичные обновления группируются по набору полей: одна форма UPDATE на executemany
+    updates: dict[tuple[str, ...], list[dict]] = {}
+    for line_number, row in rows:
+        values = row.model_dump(include=set(PRODUCT_FIELDS), exclude_unset=True)
+        if "expiration_date" in values:
+            values["is_expired"] = is_expired_on(values["expiration_date"])
+        if row.id_product is None:
+            inserts.append(values)
+            inserted += 1
+        elif values.keys() >= set(PRODUCT_FIELDS):
+            upserts.append({"id_product": row.id_product, **values})
+            if row.id_product in existing_ids:
+                updated += 1
+            else:
+                inserted += 1
+        elif row.id_product in existing_ids:
+            updates.setdefault(tuple(sorted(values)), []).append({"b_id_product": row.id_product, **values})
+            updated += 1
+        else:
+            errors.append(schemas.ProductImportError(row=line_number, detail=f"Товар с ID {row.id_product} не найден"))
+
+    batch_size = Config.PRODUCT_IMPORT_BATCH_SIZE
+    for start in range(0, len(inserts), batch_size):
+        await db.execute(products_table.insert(), inserts[start:start + batch_size])
+
+    if upserts:
+        upsert = dialect_insert(db, products_table)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[products_table.c.id_product],
+            set_={field: upsert.excluded[field] for field in PRODUCT_FIELDS + ("is_expired",)}
+        )
+        for start in range(0, len(upserts), batch_size):
+            await db.execute(upsert, upserts[start:start + batch_size])
+
+    for fields, params in updates.items():
+        stmt = (
+            update(products_table)
+            .where(products_table.c.id_product == bindparam("b_id_product"))
+            .values({field: bindparam(field) for field in fields})
+        )
+        for start in range(0, len(params), batch_size):
+            await db.execute(stmt, params[start:start + batch_size])
+
+    await db.commit()
+
+    errors.sort(key=lambda error: error.row)
+    return schemas.ProductImportReport(inserted=inserted, updated=updated, errors=errors)
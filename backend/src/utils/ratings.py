@@ -0,0 +1,109 @@
+import asyncio
+
+from sqlalchemy import case, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models, schemas
+
+RATING_VALUES = range(1, 6)
+
+
+def _histogram_column(rating: int):
+    return getattr(models.Product, f"rating_{rating}")
+
+
+async def apply_rating_delta(
+    db: AsyncSession,
+    id_product: int,
+    added: int | None = None,
+    removed: int | None = None
+) -> None:
+    """
+    Инкрементально обновляет агрегаты оценок товара в текущей транзакции.
+    Правая часть UPDATE читает значения строки до изменения, поэтому
+    параллельные отзывы не теряют приращения.
+    """
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = (added or 0) - (removed or 0)
+    count = models.Product.rating_count + count_delta
+    total = models.Product.rating_sum + sum_delta
+
+    values = {
+        "rating_count": count,
+        "rating_sum": total,
+        "rating_average": case((count > 0, total * 1.0 / count), else_=0.0),
+    }
+    if added != removed:
+        if added is not None:
+            values[f"rating_{added}"] = _histogram_column(added) + 1
+        if removed is not None:
+            values[f"rating_{removed}"] = _histogram_column(removed) - 1
+
+    await db.execute(
+        update(models.Product).where(models.Product.id_product == id_product).values(**values)
+    )
+
+
+async def remove_user_ratings(db: AsyncSession, id_user: int) -> set[int]:
+    """Вычитает оценки пользователя перед каскадным удалением его отзывов."""
+    result = await db.execute(
+        select(models.Review.id_product, models.Review.rating).where(models.Review.id_user == id_user)
+    )
+    products = set()
+    for id_product, rating in result:
+        await apply_rating_delta(db, id_product, removed=rating)
+        products.add(id_product)
+    return products
+
+
+async def rebuild_ratings(db: AsyncSession) -> int:
+    """Пересчитывает агрегаты всех товаров с нуля по таблице reviews."""
+    def review_count(rating: int | None = None):
+        stmt = select(func.count()).where(models.Review.id_product == models.Product.id_product)
+        if rating is not None:
+            stmt = stmt.where(models.Review.rating == rating)
+        return stmt.scalar_subquery()
+
+    rating_sum = (
+        select(func.coalesce(func.sum(models.Review.rating), 0))
+        .where(models.Review.id_product == models.Product.id_product)
+        .scalar_subquery()
+    )
+    average = (
+        select(func.coalesce(func.avg(models.Review.rating), 0.0))
+        .where(models.Review.id_product == models.Product.id_product)
+        .scalar_subquery()
+    )
+    values = {
+        "rating_count": review_count(),
+        "rating_sum": rating_sum,
+        "rating_average": average,
+        **{f"rating_{rating}": review_count(rating) for rating in RATING_VALUES},
+    }
+    result = await db.execute(update(models.Product).values(**values))
+    await db.commit()
+    return result.rowcount
+
+
+def product_rating(product: models.Product) -> schemas.ProductRating:
+    return schemas.ProductRating(
+        id_product=product.id_product,
+        count=product.rating_count,
+        average=product.rating_average,
+        histogram={rating: getattr(product, f"rating_{rating}") for rating in RATING_VALUES},
+    )
+
+
+async def _main() -> None:
+    from backend.src.utils.db import AsyncSessionLocal, engine
+
+    async with AsyncSessionLocal() as db:
+        updated = await rebuild_ratings(db)
+    await engine.dispose()
+    print(f"Агрегаты оценок пересчитаны для {updated} товаров")
+
+
+if __name__ == "__main__":
+    # python -m backend.src.utils.ratings
+    asyncio.run(_main())
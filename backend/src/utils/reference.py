@@ -0,0 +1,71 @@
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models, schemas
+from backend.src.config import Config
+from backend.src.utils.cache import TTLCache, get_or_load
+
+# Ключ для полного списка; отдельные записи кэшируются по ID (включая отсутствующие)
+ALL = "all"
+
+category_cache = TTLCache(Config.REFERENCE_CACHE_SIZE, Config.REFERENCE_CACHE_TTL)
+country_cache = TTLCache(Config.REFERENCE_CACHE_SIZE, Config.REFERENCE_CACHE_TTL)
+
+
+async def get_categories(db: AsyncSession) -> List[schemas.Category]:
+    async def load():
+        result = await db.execute(select(models.Category))
+        return [schemas.Category.model_validate(category) for category in result.scalars()]
+    return await get_or_load(category_cache, ALL, load)
+
+async def get_category(db: AsyncSession, id_category: int) -> schemas.Category | None:
+    async def load():
+        result = await db.execute(select(models.Category).filter(models.Category.id_category == id_category))
+        category = result.scalars().first()
+        return schemas.Category.model_validate(category) if category else None
+    return await get_or_load(category_cache, id_category, load)
+
+async def get_countries(db: AsyncSession) -> List[schemas.Country]:
+    async def load():
+        result = await db.execute(select(models.Country))
+        return [schemas.Country.model_validate(country) for country in result.scalars()]
+    return await get_or_load(country_cache, ALL, load)
+
+async def get_country(db: AsyncSession, id_country: int) -> schemas.Country | None:
+    async def load():
+        result = await db.execute(select(models.Country).filter(models.Country.id_country == id_country))
+        country = result.scalars().first()
+        return schemas.Country.model_validate(country) if country else None
+    return await get_or_load(country_cache, id_country, load)
+
+
+def invalidate_category(id_category: int) -> None:
+    category_cache.invalidate(id_category, ALL)
+
+def invalidate_country(id_country: int) -> None:
+    country_cache.invalidate(id_country, ALL)
+
+
+def stats() -> dict:
+    return {"categories": category_cache.stats(), "countries": country_cache.stats()}
+
+
+async def build_product(db: AsyncSession, product: models.Product) -> schemas.Product:
+    """
+    Собирает ответ по товару из уже загруженного объекта и кэша справочников,
+    без повторного SELECT с selectinload после записи.
+    """
+    return schemas.Product(
+        id_product=product.id_product,
+        name=product.name,
+        price_per_unit=product.price_per_unit,
+        unit_type=product.unit_type,
+        expiration_date=product.expiration_date,
+        country=await get_country(db, product.id_country),
+        category=await get_category(db, product.id_category),
+        rating_count=product.rating_count,
+        rating_average=product.rating_average,
+        is_expired=product.is_expired,
+    )
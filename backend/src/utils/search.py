@@ -0,0 +1,159 @@
+import bisect
+import re
+import time
+
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from backend.src import models, schemas
+from backend.src.config import Config
+
+# Внешнее содержимое: FTS5 хранит только индекс, текст берется из products
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, content='products', content_rowid='id_product',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name) VALUES (new.id_product, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id_product, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id_product, old.name);
+        INSERT INTO products_fts(rowid, name) VALUES (new.id_product, new.name);
+    END
+    """,
+]
+
+products_fts = table("products_fts", column("rowid"))
+_fts_table = literal_column("products_fts")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(value: str) -> list[str]:
+    return [token.casefold() for token in _WORD.findall(value)]
+
+
+async def setup_search(conn: AsyncConnection) -> None:
+    """Создает FTS5-индекс товаров и триггеры синхронизации (только SQLite)."""
+    if conn.dialect.name != "sqlite":
+        return
+    exists = await conn.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"))
+    for statement in FTS_DDL:
+        await conn.execute(text(statement))
+    if not exists:
+        # Таблица товаров могла быть заполнена до появления индекса
+        await conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+
+def match_expression(query: str) -> str | None:
+    """Все слова запроса обязательны, последнее ищется по префиксу (набор в строке поиска)."""
+    tokens = _tokens(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"' for token in tokens) + "*"
+
+
+async def search_products(db: AsyncSession, query: str, limit: int) -> list[models.Product]:
+    """Непросроченные товары, найденные по названию, в порядке bm25; вне SQLite — LIKE по словам."""
+    stmt = select(models.Product).options(
+        selectinload(models.Product.country),
+        selectinload(models.Product.category)
+    ).where(models.Product.is_expired.is_(False))
+    if db.bind.dialect.name == "sqlite":
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        stmt = (
+            stmt.join(products_fts, products_fts.c.rowid == models.Product.id_product)
+            .where(_fts_table.op("MATCH")(expression))
+            .order_by(func.bm25(_fts_table), models.Product.id_product)
+        )
+    else:
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        for token in tokens:
+            stmt = stmt.where(models.Product.name.ilike(f"%{token}%"))
+        stmt = stmt.order_by(models.Product.id_product)
+
+    result = await db.execute(stmt.limit(limit))
+    return list(result.scalars().all())
+
+
+class PrefixIndex:
+    """
+    Отсортированный массив (слово, название, id) в памяти: подсказка по первым
+    буквам — два bisect без обращения к БД. Индекс перестраивается целиком
+    после изменения товаров или по истечении TTL (изменения из других процессов).
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._keys: list[str] = []
+        self._entries: list[tuple[int, str]] = []
+        self._built_at: float | None = None
+        self._generation = 0
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._built_at = None
+
+    def _is_fresh(self) -> bool:
+        return self._built_at is not None and time.monotonic() - self._built_at < self.ttl
+
+    async def _build(self, db: AsyncSession) -> None:
+        generation = self._generation
+        result = await db.execute(
+            select(models.Product.id_product, models.Product.name).where(models.Product.is_expired.is_(False))
+        )
+        rows = []
+        for id_product, name in result:
+            for token in set(_tokens(name or "")):
+                rows.append((token, name.casefold(), id_product, name))
+        rows.sort()
+        self._keys = [row[0] for row in rows]
+        self._entries = [(row[2], row[3]) for row in rows]
+        # Товар изменился во время чтения — следующий запрос перестроит индекс снова
+        self._built_at = time.monotonic() if generation == self._generation else None
+
+    async def suggest(self, db: AsyncSession, prefix: str, limit: int) -> list[schemas.ProductSuggestion]:
+        if not self._is_fresh():
+            await self._build(db)
+        tokens = _tokens(prefix)
+        if not tokens:
+            return []
+        # Подсказки по последнему слову; предыдущие слова должны быть в названии
+        head, last = tokens[:-1], tokens[-1]
+        start = bisect.bisect_left(self._keys, last)
+        end = bisect.bisect_left(self._keys, last + "\U0010ffff", lo=start)
+
+        suggestions, seen = [], set()
+        for id_product, name in self._entries[start:end]:
+            if id_product in seen:
+                continue
+            if head and not all(token in _tokens(name) for token in head):
+                continue
+            seen.add(id_product)
+            suggestions.append(schemas.ProductSuggestion(id_product=id_product, name=name))
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    def stats(self) -> dict:
+        return {"entries": len(self._keys), "fresh": self._is_fresh()}
+
+
+product_names = PrefixIndex(Config.AUTOCOMPLETE_TTL)
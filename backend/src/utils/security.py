@@ -1,15 +1,19 @@
+import hashlib
 import os
+import time
 
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
 
-from backend.src.utils.db import get_db
+from backend.src.utils.db import AsyncSessionLocal, get_read_db
+from backend.src.utils.cache import MISSING, TTLCache
+from backend.src.utils.hashing import password_hasher
 from backend.src import models, schemas
 
 load_dotenv()
@@ -19,16 +23,13 @@ if not SECRET_KEY:
     raise ValueError("SECRET_KEY не найден в переменных окружения")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Как часто (в секундах) статус и роль пользователя из токена сверяются с БД.
+# Это верхняя граница задержки деактивации/удаления для других процессов.
+AUTH_RECHECK_SECONDS = float(os.getenv("AUTH_RECHECK_SECONDS", 60))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/token")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
 
 async def get_user_by_username(db: AsyncSession, username: str) -> models.User | None:
     """Получает пользователя из БД по имени пользователя."""
@@ -41,11 +42,26 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> models.User | None:
     return result.scalars().first()
 
 async def authenticate_user(db: AsyncSession, username: str, password: str):
+    """
+    Пользователь ищется сессией чтения: проверка хэша занимает заметное время,
+    и держать на ней единственное соединение писателя SQLite нельзя.
+    Соединение писателя берется только для перехэширования.
+    """
     user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    # Завершаем транзакцию чтения до проверки: соединение возвращается в пул
+    await db.commit()
+    is_valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not is_valid:
         return None
+    if new_hash:
+        # Параметры хэша устарели — прозрачно перехэшируем при входе
+        async with AsyncSessionLocal() as write_db:
+            await write_db.execute(
+                update(models.User).where(models.User.id == user.id).values(hashed_password=new_hash)
+            )
+            await write_db.commit()
     return user
 
 
@@ -59,12 +75,25 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# sha256(токен) -> проверенный schemas.TokenData
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def token_cache_stats() -> dict:
+    return _token_cache.stats()
+
 async def decode_access_token(token: str = Depends(oauth2_scheme)) -> schemas.TokenData:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Недействительные учетные данные (токен)",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Повторные запросы с тем же токеном не проверяют подпись заново
+    token_key = hashlib.sha256(token.encode()).digest()
+    token_data = _token_cache.get(token_key)
+    if token_data is not MISSING:
+        return token_data
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str | None = payload.get("sub")
@@ -78,12 +107,54 @@ async def decode_access_token(token: str = Depends(oauth2_scheme)) -> schemas.To
 
     except JWTError:
         raise credentials_exception
+
+    # Запись живет не дольше самого токена
+    expires = payload.get("exp")
+    ttl = expires - time.time() if isinstance(expires, (int, float)) else ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    if ttl > 0:
+        _token_cache.set(token_key, token_data, ttl=ttl)
     return token_data
 
+# user_id -> (is_active, role), недавно проверенные по БД
+_user_state = TTLCache(maxsize=10000, ttl=AUTH_RECHECK_SECONDS)
+
+
+def revoke_user_state(user_id: int) -> None:
+    """Сбрасывает проверенное состояние пользователя: следующий запрос сходит в БД."""
+    _user_state.invalidate(user_id)
+
+
+class CurrentUser:
+    """
+    Пользователь запроса, собранный из claims токена и кэша проверенных
+    состояний. Полная models.User загружается только при вызове load().
+    """
+
+    def __init__(self, token_data: schemas.TokenData, is_active: bool, role: str, db: AsyncSession, user: models.User | None = None):
+        self.id = token_data.user_id
+        self.username = token_data.username
+        self.role = role
+        self.is_active = is_active
+        self._db = db
+        self._user = user
+
+    async def load(self) -> models.User:
+        if self._user is None:
+            self._user = await get_user_by_id(self._db, self.id)
+            if self._user is None:
+                revoke_user_state(self.id)
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Пользователь из токена не найден",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+        return self._user
+
+
 async def get_current_user(
     token_data: schemas.TokenData = Depends(decode_access_token),
-    db: AsyncSession = Depends(get_db)
-) -> models.User:
+    db: AsyncSession = Depends(get_read_db)
+) -> CurrentUser:
     if token_data.user_id is None:
          raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -91,6 +162,11 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    state = _user_state.get(token_data.user_id)
+    if state is not MISSING:
+        is_active, role = state
+        return CurrentUser(token_data, is_active, role, db)
+
     user = await get_user_by_id(db, user_id=token_data.user_id)
     if user is None:
         raise HTTPException(
@@ -99,18 +175,19 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return user
+    _user_state.set(user.id, (user.is_active, user.role))
+    return CurrentUser(token_data, user.is_active, user.role, db, user)
 
 async def get_current_active_user(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
 
     if not current_user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Неактивный пользователь")
     return current_user
 
 def has_role(required_role: str):
-    async def role_checker(current_user: models.User = Depends(get_current_active_user)) -> models.User:
+    async def role_checker(current_user: CurrentUser = Depends(get_current_active_user)) -> CurrentUser:
         if current_user.role != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
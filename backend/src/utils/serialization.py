@@ -0,0 +1,52 @@
+from functools import lru_cache
+from typing import Any, Iterable
+
+from fastapi import Response, status
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # orjson — необязательная зависимость
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Класс ответа по умолчанию: кодирует через orjson, а без него — как обычный
+    JSONResponse. Ключи-числа (гистограмма рейтинга) допускаются, как в json.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def adapter(tp) -> TypeAdapter:
+    """TypeAdapter строится один раз на тип: схема валидации и сериализатор переиспользуются."""
+    return TypeAdapter(tp)
+
+
+def row_records(keys, rows: Iterable) -> list[dict]:
+    """Строки SQL в словари: zip по ключам результата заметно дешевле Row._asdict()."""
+    keys = list(keys)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def validate_records(tp, records: list[dict]) -> list:
+    """
+    Собирает модели из словарей строк без объектов ORM: одна проверка списка
+    целиком в pydantic-core. Проверка через from_attributes по Row в разы медленнее.
+    """
+    return adapter(list[tp]).validate_python(records)
+
+
+def model_response(tp, value: Any, status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Ответ из уже проверенных моделей: JSON строится сериализатором pydantic-core,
+    минуя повторную проверку response_model в FastAPI. response_model в декораторе
+    остается для документации OpenAPI.
+    """
+    return Response(adapter(tp).dump_json(value), status_code=status_code, media_type="application/json")
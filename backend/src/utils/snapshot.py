@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import json
+from typing import Hashable
+
+from fastapi import Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.src import schemas
+from backend.src.config import Config
+from backend.src.utils.cache import MISSING, TTLCache
+from backend.src.utils.pagination import fetch_products_page
+from backend.src.utils.serialization import adapter
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость
+    brotli = None
+
+
+def _accepted_encodings(request: Request) -> set[str]:
+    encodings = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class EncodedPage:
+    """Готовое тело ответа страницы каталога, его ETag и сжатые варианты."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        self._variants: dict[str, bytes] = {}
+
+    def variant(self, encoding: str) -> bytes:
+        if encoding not in self._variants:
+            if encoding == "br":
+                self._variants[encoding] = brotli.compress(self.body)
+            else:
+                self._variants[encoding] = gzip.compress(self.body, compresslevel=6)
+        return self._variants[encoding]
+
+    def not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        if self.not_modified(request):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        accepted = _accepted_encodings(request)
+        if brotli is not None and "br" in accepted:
+            headers["Content-Encoding"] = "br"
+            return Response(self.variant("br"), media_type="application/json", headers=headers)
+        if "gzip" in accepted:
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.variant("gzip"), media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+class CatalogSnapshot:
+    """
+    Версионированный снимок каталога: JSON каждого товара кодируется один раз
+    и переиспользуется всеми страницами, пока товар, его категория или страна
+    не изменятся. Готовые страницы хранятся целиком вместе с ETag.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.version = 0
+        self.pages = TTLCache(maxsize, ttl)
+        # id_product -> (id_category, id_country, товар, JSON товара)
+        self._fragments: dict[int, tuple[int, int, schemas.Product, bytes]] = {}
+
+    def _fragment(self, product: schemas.Product, store: bool) -> bytes:
+        cached = self._fragments.get(product.id_product)
+        # Готовый JSON переиспользуется, только если совпадает со строкой, прочитанной
+        # сейчас: изменения из других процессов, CLI или SQL не застревают в кэше
+        if cached is None or cached[2] != product:
+            body = adapter(schemas.Product).dump_json(product)
+            cached = (product.category.id_category, product.country.id_country, product, body)
+            if store:
+                self._fragments[product.id_product] = cached
+        return cached[3]
+
+    def build_page(self, products: list[schemas.Product], next_cursor: str | None, store: bool = True) -> EncodedPage:
+        items = b",".join(self._fragment(product, store) for product in products)
+        return EncodedPage(b'{"items":[' + items + b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}")
+
+    def _bump(self) -> None:
+        self.version += 1
+        self.pages.clear()
+
+    def invalidate_product(self, id_product: int) -> None:
+        self._fragments.pop(id_product, None)
+        self._bump()
+
+    def invalidate_products(self, ids: list[int]) -> None:
+        for id_product in ids:
+            self._fragments.pop(id_product, None)
+        self._bump()
+
+    def invalidate_category(self, id_category: int) -> None:
+        stale = [key for key, (category, _, _, _) in self._fragments.items() if category == id_category]
+        for key in stale:
+            del self._fragments[key]
+        self._bump()
+
+    def invalidate_country(self, id_country: int) -> None:
+        stale = [key for key, (_, country, _, _) in self._fragments.items() if country == id_country]
+        for key in stale:
+            del self._fragments[key]
+        self._bump()
+
+    def clear(self) -> None:
+        self._fragments.clear()
+        self._bump()
+
+    def stats(self) -> dict:
+        return {"version": self.version, "products": len(self._fragments), "pages": self.pages.stats()}
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        filters: schemas.ProductFilter,
+        sort: schemas.ProductSortEnum,
+        limit: int,
+        cursor: str | None
+    ) -> EncodedPage:
+        key: Hashable = (tuple(filters.model_dump().items()), sort.value, limit, cursor)
+        page = self.pages.get(key)
+        if page is MISSING:
+            version = self.version
+            products, next_cursor = await fetch_products_page(db, filters, sort, limit, cursor)
+            # Если каталог изменился, пока мы читали БД, результат не кэшируем
+            fresh = version == self.version
+            page = self.build_page(products, next_cursor, store=fresh)
+            if fresh:
+                self.pages.set(key, page)
+        return page
+
+
+catalog_snapshot = CatalogSnapshot(Config.CATALOG_SNAPSHOT_SIZE, Config.CATALOG_SNAPSHOT_TTL)
+
+
+async def catalog_response(
+    request: Request,
+    db: AsyncSession,
+    filters: schemas.ProductFilter,
+    sort: schemas.ProductSortEnum,
+    limit: int,
+    cursor: str | None
+) -> Response:
+    """Отдает страницу каталога из снимка; при совпадении If-None-Match БД не читается."""
+    page = await catalog_snapshot.get_page(db, filters, sort, limit, cursor)
+    return page.response(request)
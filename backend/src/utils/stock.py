@@ -0,0 +1,95 @@
+from fastapi import HTTPException, status
+from sqlalchemy import Numeric, case, cast, func, literal, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.src import models
+
+# stock IS NULL — остаток не ведется, товар не ограничен
+_stock = models.Product.stock
+
+
+def _rounded(expr):
+    # Количества в строках заказа — Float: без приведения к numeric в PostgreSQL
+    # выражение было бы double precision, а round(double precision, int) там нет
+    return func.round(cast(expr, Numeric(12, 3)), 3)
+
+
+def _shortage(ids) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Недостаточно товара на складе: ID {sorted(ids)}"
+    )
+
+
+async def _take(db: AsyncSession, ids, need) -> set[int]:
+    """
+    Условное атомарное списание одним UPDATE на все строки заказа: строка
+    меняется, только если остатка хватает, поэтому параллельные покупатели
+    не уходят в минус и не теряют обновления без SELECT ... FOR UPDATE.
+    Округление до 0.001 не дает копиться погрешности REAL в SQLite.
+    """
+    result = await db.execute(
+        update(models.Product)
+        .where(models.Product.id_product.in_(ids), or_(_stock.is_(None), _stock >= need))
+        .values(stock=_rounded(_stock - need))
+        .returning(models.Product.id_product)
+        .execution_options(synchronize_session=False)
+    )
+    return set(result.scalars())
+
+
+async def reserve(db: AsyncSession, quantities: dict[int, float]) -> None:
+    """Списывает остатки по словарю id_product -> количество или отклоняет заказ целиком."""
+    if not quantities:
+        return
+    need = case(
+        {id_product: literal(quantity, _stock.type) for id_product, quantity in quantities.items()},
+        value=models.Product.id_product
+    )
+    reserved = await _take(db, list(quantities), need)
+    if reserved != set(quantities):
+        raise _shortage(set(quantities) - reserved)
+
+
+def _order_quantity(id_order: int):
+    return (
+        select(func.sum(models.OrderDetail.quantity))
+        .where(models.OrderDetail.id_order == id_order, models.OrderDetail.id_product == models.Product.id_product)
+        .scalar_subquery()
+    )
+
+
+def _order_products(id_order: int):
+    return select(models.OrderDetail.id_product).where(models.OrderDetail.id_order == id_order)
+
+
+async def reserve_order(db: AsyncSession, id_order: int) -> None:
+    """Повторное списание по уже сохраненным строкам заказа (возврат из отмены)."""
+    result = await db.execute(_order_products(id_order))
+    expected = set(result.scalars())
+    reserved = await _take(db, _order_products(id_order), _order_quantity(id_order))
+    if reserved != expected:
+        raise _shortage(expected - reserved)
+
+
+async def reserve_cart(db: AsyncSession, user_id: int, id_products: set[int]) -> None:
+    """Списание при оформлении корзины: количества берутся из cart_items тем же UPDATE."""
+    need = (
+        select(models.CartItem.quantity)
+        .where(models.CartItem.user_id == user_id, models.CartItem.product_id == models.Product.id_product)
+        .scalar_subquery()
+    )
+    reserved = await _take(db, list(id_products), need)
+    if reserved != id_products:
+        raise _shortage(id_products - reserved)
+
+
+async def release_order(db: AsyncSession, id_order: int) -> None:
+    """Возвращает на склад количество отмененного заказа."""
+    await db.execute(
+        update(models.Product)
+        .where(models.Product.id_product.in_(_order_products(id_order)), _stock.is_not(None))
+        .values(stock=_rounded(_stock + _order_quantity(id_order)))
+        .execution_options(synchronize_session=False)
+    )
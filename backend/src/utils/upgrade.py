@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import Integer, UniqueConstraint, event, inspect, text
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import AddConstraint, CreateColumn
+
+from backend.src import models  # noqa: F401 — регистрирует таблицы в Base.metadata
+from backend.src.config import Config
+from backend.src.utils.db import Base, create_engine
+from backend.src.utils.money import Money
+from backend.src.utils.search import setup_search
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _legacy_money(column, reflected: dict) -> bool:
+    """Денежная колонка из базы до перехода на копейки: объявлена дробной, а не целой."""
+    return isinstance(column.type, Money) and not isinstance(reflected["type"], Integer)
+
+
+def schema_changes(conn: Connection) -> dict[str, list[str]]:
+    """
+    Сравнивает существующую базу с моделями: чего не хватает каждой таблице.
+    create_all создает только отсутствующие таблицы и не трогает существующие.
+    """
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    changes = {}
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            changes[table.name] = ["новая таблица"]
+            continue
+        reflected = {column["name"]: column for column in inspector.get_columns(table.name)}
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        constraints = {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        reasons = []
+        for column in table.columns:
+            if column.name not in reflected:
+                reasons.append(f"столбец {column.name}")
+            elif _legacy_money(column, reflected[column.name]):
+                reasons.append(f"рубли -> копейки в {column.name}")
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in constraints | indexes:
+                reasons.append(f"ограничение {constraint.name}")
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in indexes:
+                reasons.append(f"индекс {index.name}")
+        if reasons:
+            changes[table.name] = reasons
+    return changes
+
+
+def _rebuild_sqlite_table(conn: Connection, table) -> int:
+    """
+    SQLite не меняет тип и ограничения существующих столбцов, поэтому таблица
+    пересоздается по модели с переносом строк; id сохраняются, рубли
+    переводятся в копейки. Возвращает число строк, отброшенных новыми
+    ограничениями уникальности (остается первая по id).
+    """
+    inspector = inspect(conn)
+    reflected = {column["name"]: column for column in inspector.get_columns(table.name)}
+    old_indexes = [index["name"] for index in inspector.get_indexes(table.name)]
+    name, legacy = _quote(conn, table.name), _quote(conn, f"{table.name}__legacy")
+
+    # legacy_alter_table: внешние ключи других таблиц продолжают ссылаться на имя,
+    # а не переезжают вслед за переименованной таблицей
+    conn.exec_driver_sql("PRAGMA legacy_alter_table=ON")
+    conn.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {legacy}")
+    for index in old_indexes:
+        conn.exec_driver_sql(f"DROP INDEX {_quote(conn, index)}")
+    table.create(conn)
+
+    columns, values = [], []
+    for column in table.columns:
+        if column.name not in reflected:
+            continue  # новый столбец получает значение по умолчанию
+        quoted = _quote(conn, column.name)
+        columns.append(quoted)
+        if _legacy_money(column, reflected[column.name]):
+            values.append(f"CAST(ROUND({quoted} * 100) AS INTEGER)")
+        else:
+            values.append(quoted)
+    before = conn.exec_driver_sql(f"SELECT count(*) FROM {legacy}").scalar()
+    conn.exec_driver_sql(
+        f"INSERT OR IGNORE INTO {name} ({', '.join(columns)}) "
+        f"SELECT {', '.join(values)} FROM {legacy} ORDER BY rowid"
+    )
+    after = conn.exec_driver_sql(f"SELECT count(*) FROM {name}").scalar()
+    conn.exec_driver_sql(f"DROP TABLE {legacy}")
+    conn.exec_driver_sql("PRAGMA legacy_alter_table=OFF")
+    return before - after
+
+
+def _upgrade_sqlite(conn: Connection, changes: dict[str, list[str]]) -> None:
+    existing = set(inspect(conn).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name in changes and table.name in existing:
+            dropped = _rebuild_sqlite_table(conn, table)
+            if dropped:
+                changes[table.name].append(f"отброшено дублей: {dropped}")
+
+
+def _upgrade_postgresql(conn: Connection, changes: dict[str, list[str]]) -> None:
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in changes or table.name not in existing:
+            continue
+        name = _quote(conn, table.name)
+        reflected = {column["name"]: column for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in reflected:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {name} ADD COLUMN {ddl}")
+            elif _legacy_money(column, reflected[column.name]):
+                quoted = _quote(conn, column.name)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {name} ALTER COLUMN {quoted} TYPE INTEGER USING round({quoted} * 100)"
+                )
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        constraints = {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in constraints | indexes:
+                conn.execute(AddConstraint(constraint))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in indexes:
+                index.create(conn)
+
+
+async def upgrade_schema(conn: AsyncConnection) -> dict[str, list[str]]:
+    """
+    Доводит существующую базу до текущих моделей: добавляет столбцы, индексы
+    и ограничения, переводит старые суммы в рублях в копейки. Возвращает
+    изменения по таблицам; пустой словарь — база уже актуальна.
+    """
+    changes = await conn.run_sync(schema_changes)
+    if not changes:
+        return changes
+    if conn.dialect.name == "sqlite":
+        await conn.run_sync(_upgrade_sqlite, changes)
+    else:
+        await conn.run_sync(_upgrade_postgresql, changes)
+    await conn.run_sync(Base.metadata.create_all)
+    await setup_search(conn)
+    if conn.dialect.name == "sqlite" and "products" in changes:
+        # Триггеры FTS ушли вместе со старой таблицей; индекс перестраивается по новой
+        await conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    return changes
+
+
+def _begin_sqlite_explicitly(upgrade_engine) -> None:
+    # pysqlite открывает транзакцию только перед DML, и DDL пересборки выполнялся бы
+    # вне ее; BEGIN вручную делает обновление атомарным
+    @event.listens_for(upgrade_engine.sync_engine, "connect")
+    def _autocommit_driver(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(upgrade_engine.sync_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+async def _main() -> None:
+    from backend.src.utils.analytics import rebuild_rollups
+    from backend.src.utils.db import AsyncSessionLocal, engine, read_engine
+    from backend.src.utils.inventory import expire_products
+    from backend.src.utils.pricing import retotal_orders
+    from backend.src.utils.ratings import rebuild_ratings
+
+    db_url = make_url(engine.url)
+    is_sqlite = db_url.get_backend_name() == "sqlite"
+    async with engine.connect() as conn:
+        pending = await conn.run_sync(schema_changes)
+        if pending and is_sqlite and db_url.database not in (None, "", ":memory:"):
+            backup = f"{db_url.database}.{datetime.now():%Y%m%d%H%M%S}.bak"
+            await conn.exec_driver_sql(f"VACUUM INTO '{backup}'")
+            print(f"Резервная копия: {backup}")
+
+    upgrade_engine = create_engine(pool_size=1, max_overflow=0)
+    if is_sqlite:
+        _begin_sqlite_explicitly(upgrade_engine)
+    async with upgrade_engine.begin() as conn:
+        changes = await upgrade_schema(conn)
+    await upgrade_engine.dispose()
+    if not changes:
+        print("Схема базы актуальна")
+        return
+    for table, reasons in changes.items():
+        print(f"{table}: {', '.join(reasons)}")
+
+    # Производные данные новых столбцов и таблиц считаются по исходным строкам
+    async with AsyncSessionLocal() as db:
+        await rebuild_ratings(db)
+        await retotal_orders(db)
+        await rebuild_rollups(db)
+    expired = await expire_products(Config.EXPIRATION_JOB_BATCH_SIZE)
+    await engine.dispose()
+    await read_engine.dispose()
+    print(f"Пересчитаны оценки, итоги заказов и сводки продаж; просрочено товаров: {expired}")
+
+
+if __name__ == "__main__":
+    # python -m backend.src.utils.upgrade
+    asyncio.run(_main())
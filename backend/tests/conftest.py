@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+# Окружение задается до импорта приложения: движки БД создаются при импорте
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="fruitshop-tests-"), "test.db")
+os.environ.setdefault("EXPIRATION_JOB_INTERVAL_SECONDS", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend.src import app, models, schemas
+from backend.src.utils import reference, security
+from backend.src.utils.db import AsyncSessionLocal, Base, engine, read_engine
+from backend.src.utils.search import product_names, setup_search
+from backend.src.utils.snapshot import catalog_snapshot
+
+PRODUCT_COUNT = 10
+
+
+def auth_headers(user_id: int, username: str, role: str) -> dict:
+    token = security.create_access_token({"sub": username, "user_id": user_id, "role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+ADMIN = auth_headers(1, "admin", "admin")
+USER = auth_headers(2, "bob", "user")
+
+
+async def _reset_database() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.exec_driver_sql("DROP TABLE IF EXISTS products_fts")
+        await conn.run_sync(Base.metadata.create_all)
+        await setup_search(conn)
+
+    async with AsyncSessionLocal() as db:
+        # Токены тестов выпускаются напрямую, пароль не проверяется
+        db.add_all([
+            models.User(username="admin", email="admin@example.com", hashed_password="-", role="admin"),
+            models.User(username="bob", email="bob@example.com", hashed_password="-"),
+            models.Category(name_category="Фрукты"),
+            models.Country(name_country="Испания"),
+        ])
+        await db.flush()
+        db.add_all([
+            models.Product(
+                name=f"Товар {i}",
+                id_country=1,
+                id_category=1,
+                price_per_unit=10 + i,
+                unit_type=schemas.UnitType.PIECE,
+                expiration_date=date.today() + timedelta(days=30)
+            )
+            for i in range(1, PRODUCT_COUNT + 1)
+        ])
+        await db.commit()
+
+
+async def _dispose_engines() -> None:
+    # Пулы asyncio привязаны к циклу событий, а у каждого TestClient он свой
+    await engine.dispose()
+    await read_engine.dispose()
+
+
+def _clear_caches() -> None:
+    catalog_snapshot.clear()
+    reference.category_cache.clear()
+    reference.country_cache.clear()
+    security._user_state.clear()
+    product_names.invalidate()
+
+
+@pytest.fixture
+def client():
+    """Приложение на чистой БД: два пользователя, категория, страна и PRODUCT_COUNT товаров."""
+    with TestClient(app) as test_client:
+        test_client.portal.call(_reset_database)
+        _clear_caches()
+        yield test_client
+        test_client.portal.call(_dispose_engines)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries():
+    """Считает SQL-запросы, ушедшие в БД через движки писателя и читателя."""
+    counter = QueryCounter()
+    engines = {engine.sync_engine, read_engine.sync_engine}
+    for sync_engine in engines:
+        event.listen(sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        for sync_engine in engines:
+            event.remove(sync_engine, "before_cursor_execute", counter)
@@ -0,0 +1,46 @@
+from conftest import ADMIN, USER
+
+
+def _order(*lines) -> dict:
+    return {"id_user": 2, "order_details": [{"id_product": id_product, "quantity": quantity} for id_product, quantity in lines]}
+
+
+def _report(client, group_by: str) -> list[dict]:
+    response = client.get("/analytics/sales", headers=ADMIN, params={"group_by": group_by})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _rebuilt_report(client, group_by: str) -> list[dict]:
+    assert client.post("/analytics/rebuild", headers=ADMIN).status_code == 204
+    return _report(client, group_by)
+
+
+def test_deleting_user_removes_their_orders_from_rollups(client):
+    client.put("/product/1", headers=ADMIN, json={"stock": 10})
+    assert client.post("/orders", headers=USER, json=_order((1, 2), (2, 1))).status_code == 201
+    assert _report(client, "day") != []
+
+    assert client.delete("/users/2", headers=ADMIN).status_code == 204
+
+    assert _report(client, "day") == []
+    assert _report(client, "product") == _rebuilt_report(client, "product") == []
+    assert client.get("/product/1/stock").json()["stock"] == 10
+
+
+def test_grouped_reports_count_orders_not_lines(client):
+    assert client.post("/orders", headers=USER, json=_order((1, 1), (2, 1), (3, 1))).status_code == 201
+    second = client.post("/orders", headers=USER, json=_order((1, 2)))
+    assert second.status_code == 201
+
+    by_category = _report(client, "category")
+    assert [(bucket["key"], bucket["orders"]) for bucket in by_category] == [("1", 2)]
+    by_product = {bucket["key"]: bucket["orders"] for bucket in _report(client, "product")}
+    assert by_product == {"1": 2, "2": 1, "3": 1}
+    assert _report(client, "day")[0]["orders"] == 2
+
+    for group_by in ("day", "category", "country", "product"):
+        assert _report(client, group_by) == _rebuilt_report(client, group_by)
+
+    client.put(f"/orders/{second.json()['id_order']}", headers=ADMIN, json={"status": "cancelled"})
+    assert [bucket["orders"] for bucket in _report(client, "category")] == [1]
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+
+from backend.src import app
+
+from conftest import USER
+
+TASKS = 100
+
+
+async def _hammer(requests) -> list[int]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(request(client) for request in requests))
+    return [response.status_code for response in responses]
+
+
+def _cart(client) -> dict[int, int]:
+    return {item["product_id"]: item["quantity"] for item in client.get("/cart", headers=USER).json()}
+
+
+def test_concurrent_adds_of_one_product_are_not_lost(client):
+    requests = [
+        lambda http: http.post("/cart/items", headers=USER, json={"product_id": 1, "quantity": 1})
+        for _ in range(TASKS)
+    ]
+
+    codes = client.portal.call(_hammer, requests)
+
+    assert codes == [201] * TASKS
+    assert _cart(client) == {1: TASKS}
+
+
+def test_concurrent_mixed_mutations_keep_cart_consistent(client):
+    # Добавления в несколько товаров вперемешку с изменением и удалением одного из них
+    requests = []
+    for i in range(TASKS):
+        id_product = i % 3 + 1
+        requests.append(lambda http, id_product=id_product: http.post(
+            "/cart/items", headers=USER, json={"product_id": id_product, "quantity": 2}
+        ))
+    client.post("/cart/items", headers=USER, json={"product_id": 4, "quantity": 1})
+    requests += [
+        lambda http: http.put("/cart/items/4", headers=USER, json={"quantity": 5}),
+        lambda http: http.delete("/cart/items/5", headers=USER),
+    ]
+
+    codes = client.portal.call(_hammer, requests)
+
+    assert codes[:TASKS] == [201] * TASKS
+    assert codes[TASKS:] == [200, 404]
+    assert _cart(client) == {1: 68, 2: 66, 3: 66, 4: 5}
+
+
+def test_missing_product_is_not_added(client):
+    response = client.post("/cart/items", headers=USER, json={"product_id": 999, "quantity": 1})
+    assert response.status_code == 404
+    assert _cart(client) == {}
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import httpx
+
+from backend.src import app
+
+from conftest import ADMIN, USER
+
+NEW_PRODUCT = {
+    "name": "Киви", "price_per_unit": 3.5, "unit_type": "шт",
+    "expiration_date": "2099-01-01", "id_country": 1, "id_category": 1,
+}
+
+
+def _ndjson(*records) -> str:
+    return "\n".join(json.dumps(record, ensure_ascii=False) for record in records)
+
+
+def _import(client, *records) -> dict:
+    response = client.post("/product/bulk", headers=ADMIN, content=_ndjson(*records))
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_explicit_nulls_are_rejected(client):
+    nulls = {field: None for field in NEW_PRODUCT}
+    report = _import(
+        client,
+        nulls,
+        {"id_product": 1, **nulls},
+        {"id_product": 2, "name": None},
+        NEW_PRODUCT,
+    )
+
+    assert (report["inserted"], report["updated"]) == (1, 0)
+    assert [error["row"] for error in report["errors"]] == [1, 2, 3]
+    assert "name" in report["errors"][2]["detail"]
+    response = client.get("/product/all", params={"limit": 100})
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 11
+
+
+async def _upload_while_adding_to_cart() -> tuple[int, int]:
+    body_started, cart_done = asyncio.Event(), asyncio.Event()
+
+    async def body():
+        yield (_ndjson(NEW_PRODUCT) + "\n").encode()
+        body_started.set()
+        await cart_done.wait()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        upload = asyncio.create_task(client.post("/product/bulk", headers=ADMIN, content=body()))
+        await body_started.wait()
+        try:
+            cart = await asyncio.wait_for(
+                client.post("/cart/items", headers=USER, json={"product_id": 1, "quantity": 1}), 5
+            )
+        finally:
+            cart_done.set()
+        return cart.status_code, (await upload).status_code
+
+
+def test_slow_upload_does_not_hold_the_writer(client):
+    # Пока тело импорта не дочитано, соединение писателя должно оставаться свободным
+    assert client.portal.call(_upload_while_adding_to_cart) == (201, 200)
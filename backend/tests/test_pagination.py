@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from backend.src import models
+from backend.src.utils.db import AsyncSessionLocal
+
+from conftest import ADMIN, PRODUCT_COUNT
+
+
+def _cursor(sort: str, values: list) -> str:
+    raw = json.dumps({"s": sort, "k": values}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _all_products(client, sort: str) -> list[int]:
+    ids, cursor = [], None
+    while True:
+        params = {"sort": sort, "limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/product/all", params=params).json()
+        ids += [item["id_product"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort", ["id_asc", "price_desc", "rating_desc"])
+def test_cursor_walks_the_whole_catalog(client, sort):
+    assert sorted(_all_products(client, sort)) == list(range(1, PRODUCT_COUNT + 1))
+
+
+@pytest.mark.parametrize("path, sort, values", [
+    ("/product/all", "price_asc", ["abc", 1]),
+    ("/product/all", "price_asc", ["NaN", 1]),
+    ("/product/all", "id_asc", [[1]]),
+    ("/product/all", "id_asc", [True]),
+    ("/product/all", "id_asc", [2 ** 70]),
+    ("/product/all", "rating_desc", ["4.5", 1]),
+    ("/orders/all", "orders", ["вчера", 1]),
+    ("/orders/all", "orders", ["2024-01-01T00:00:00", "1"]),
+    ("/review/all", "reviews:newest", [{"id": 1}]),
+])
+def test_crafted_cursor_is_rejected(client, path, sort, values):
+    params = {"cursor": _cursor(sort, values)}
+    if path == "/product/all":
+        params["sort"] = sort
+    elif path == "/review/all":
+        params["sort"] = "newest"
+    response = client.get(path, headers=ADMIN, params=params)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Некорректный курсор"
+
+
+async def _expire_without_job(id_product: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.Product)
+            .where(models.Product.id_product == id_product)
+            .values(expiration_date=date.today() - timedelta(days=1))
+        )
+        await db.commit()
+
+
+def test_expired_products_are_hidden_unless_requested(client):
+    # Фоновая задача еще не поставила is_expired: товар скрывается по дате
+    client.portal.call(_expire_without_job, 1)
+
+    visible = [item["id_product"] for item in client.get("/product/all", params={"limit": 100}).json()["items"]]
+    assert visible == list(range(2, PRODUCT_COUNT + 1))
+    everything = client.get("/product/all", params={"limit": 100, "include_expired": True}).json()["items"]
+    assert [item["id_product"] for item in everything] == list(range(1, PRODUCT_COUNT + 1))
@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import ADMIN, USER, count_queries
+
+NEW_PRODUCT = {
+    "name": "Манго",
+    "price_per_unit": 5,
+    "unit_type": "шт",
+    "expiration_date": str(date.today() + timedelta(days=10)),
+    "id_country": 1,
+    "id_category": 1,
+}
+ORDER = {"id_user": 2, "order_details": [{"id_product": 1, "quantity": 1}, {"id_product": 2, "quantity": 2}]}
+
+
+@pytest.fixture
+def warm_client(client):
+    # Состояние пользователей из токенов и справочники уже в кэше:
+    # считаются только запросы самой операции
+    client.get("/cart", headers=ADMIN)
+    client.get("/cart", headers=USER)
+    client.get("/category/1")
+    client.get("/country/1")
+    return client
+
+
+def _measure(client, method: str, path: str, headers: dict, **kwargs):
+    with count_queries() as queries:
+        response = getattr(client, method)(path, headers=headers, **kwargs)
+    return response, queries
+
+
+def test_add_product(warm_client):
+    # Категория и страна берутся из кэша справочников, остается INSERT ... RETURNING
+    response, queries = _measure(warm_client, "post", "/product", ADMIN, json=NEW_PRODUCT)
+    assert response.status_code == 201
+    assert queries.count <= 1, queries.statements
+
+
+def test_update_product(warm_client):
+    response, queries = _measure(warm_client, "put", "/product/1", ADMIN, json={"price_per_unit": 7})
+    assert response.status_code == 200
+    assert queries.count <= 2, queries.statements
+
+
+def test_create_order(warm_client):
+    # Товары, списание остатков, заказ, строки, три сводки аналитики
+    response, queries = _measure(warm_client, "post", "/orders", USER, json=ORDER)
+    assert response.status_code == 201
+    assert queries.count <= 7, queries.statements
+
+
+def test_update_order(warm_client):
+    id_order = warm_client.post("/orders", headers=USER, json=ORDER).json()["id_order"]
+    response, queries = _measure(warm_client, "put", f"/orders/{id_order}", ADMIN, json={"status": "shipped"})
+    assert response.status_code == 200
+    assert queries.count <= 3, queries.statements
+
+
+def test_add_review(warm_client):
+    review = {"id_user": 2, "id_product": 1, "rating": 5, "comment": "Вкусно"}
+    response, queries = _measure(warm_client, "post", "/review", USER, json=review)
+    assert response.status_code == 201
+    assert queries.count <= 3, queries.statements
+
+
+def test_update_review(warm_client):
+    review = {"id_user": 2, "id_product": 1, "rating": 5, "comment": "Вкусно"}
+    id_review = warm_client.post("/review", headers=USER, json=review).json()["id_review"]
+    response, queries = _measure(warm_client, "put", f"/review/{id_review}", USER, json={"rating": 4})
+    assert response.status_code == 200
+    assert queries.count <= 3, queries.statements
+
+
+def test_cart_add(warm_client):
+    response, queries = _measure(warm_client, "post", "/cart/items", USER, json={"product_id": 1, "quantity": 2})
+    assert response.status_code == 201
+    assert queries.count <= 2, queries.statements
+
+
+def test_cart_update(warm_client):
+    warm_client.post("/cart/items", headers=USER, json={"product_id": 1, "quantity": 2})
+    response, queries = _measure(warm_client, "put", "/cart/items/1", USER, json={"quantity": 3})
+    assert response.status_code == 200
+    assert queries.count <= 2, queries.statements
+
+
+def test_cart_remove(warm_client):
+    warm_client.post("/cart/items", headers=USER, json={"product_id": 1, "quantity": 2})
+    response, queries = _measure(warm_client, "delete", "/cart/items/1", USER)
+    assert response.status_code == 204
+    assert queries.count <= 1, queries.statements
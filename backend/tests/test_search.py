@@ -0,0 +1,35 @@
+from datetime import date, timedelta
+
+from sqlalchemy import update
+
+from backend.src import models
+from backend.src.utils.db import AsyncSessionLocal
+from backend.src.utils.inventory import expire_products
+
+
+async def _expire_product(id_product: int) -> int:
+    # Срок вышел "вчера": флаг выставит задача, как это происходит в работе
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.Product)
+            .where(models.Product.id_product == id_product)
+            .values(expiration_date=date.today() - timedelta(days=1))
+        )
+        await db.commit()
+    return await expire_products(batch_size=100)
+
+
+def _ids(items: list[dict]) -> set[int]:
+    return {item["id_product"] for item in items}
+
+
+def test_expired_products_leave_search_and_autocomplete(client):
+    assert 1 in _ids(client.get("/product/search", params={"q": "товар"}).json())
+    assert 1 in _ids(client.get("/product/autocomplete", params={"q": "тов"}).json())
+
+    assert client.portal.call(_expire_product, 1) == 1
+
+    assert 1 not in _ids(client.get("/product/search", params={"q": "товар"}).json())
+    suggestions = _ids(client.get("/product/autocomplete", params={"q": "тов", "limit": 20}).json())
+    assert 1 not in suggestions
+    assert 2 in suggestions
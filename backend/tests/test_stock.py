@@ -0,0 +1,78 @@
+import asyncio
+
+import httpx
+
+from backend.src import app
+
+from conftest import ADMIN, USER
+
+BUYERS = 60
+STOCK = 20
+
+
+def _order(id_product: int, quantity: float = 1) -> dict:
+    return {"id_user": 2, "order_details": [{"id_product": id_product, "quantity": quantity}]}
+
+
+async def _buy_concurrently(count: int, id_product: int) -> list[int]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(
+            *(client.post("/orders", headers=USER, json=_order(id_product)) for _ in range(count))
+        )
+    return [response.status_code for response in responses]
+
+
+def test_concurrent_buyers_do_not_oversell(client):
+    assert client.put("/product/1", headers=ADMIN, json={"stock": STOCK}).status_code == 200
+
+    codes = client.portal.call(_buy_concurrently, BUYERS, 1)
+
+    assert codes.count(201) == STOCK
+    assert codes.count(409) == BUYERS - STOCK
+    assert client.get("/product/1/stock").json()["stock"] == 0
+    orders = client.get("/orders/all", headers=ADMIN, params={"limit": 100}).json()["items"]
+    assert len(orders) == STOCK
+
+
+def test_order_is_rejected_whole_when_one_line_is_short(client):
+    client.put("/product/1", headers=ADMIN, json={"stock": 5})
+    client.put("/product/2", headers=ADMIN, json={"stock": 1})
+    order = {"id_user": 2, "order_details": [{"id_product": 1, "quantity": 2}, {"id_product": 2, "quantity": 3}]}
+
+    response = client.post("/orders", headers=USER, json=order)
+
+    assert response.status_code == 409
+    assert client.get("/product/1/stock").json()["stock"] == 5
+    assert client.get("/product/2/stock").json()["stock"] == 1
+
+
+def test_cancel_restocks_and_uncancel_reserves_again(client):
+    client.put("/product/1", headers=ADMIN, json={"stock": 2.5})
+    id_order = client.post("/orders", headers=USER, json=_order(1, 2)).json()["id_order"]
+    assert client.get("/product/1/stock").json()["stock"] == 0.5
+
+    assert client.put(f"/orders/{id_order}", headers=ADMIN, json={"status": "cancelled"}).status_code == 200
+    assert client.get("/product/1/stock").json()["stock"] == 2.5
+
+    assert client.put(f"/orders/{id_order}", headers=ADMIN, json={"status": "pending"}).status_code == 200
+    assert client.get("/product/1/stock").json()["stock"] == 0.5
+
+
+def test_deleting_order_releases_its_stock(client):
+    client.put("/product/1", headers=ADMIN, json={"stock": 5})
+    active = client.post("/orders", headers=USER, json=_order(1, 2)).json()["id_order"]
+    cancelled = client.post("/orders", headers=USER, json=_order(1, 1)).json()["id_order"]
+    client.put(f"/orders/{cancelled}", headers=ADMIN, json={"status": "cancelled"})
+    assert client.get("/product/1/stock").json()["stock"] == 3
+
+    # Отмененный заказ уже вернул свое количество: повторного возврата нет
+    assert client.delete(f"/orders/{cancelled}", headers=ADMIN).status_code == 204
+    assert client.get("/product/1/stock").json()["stock"] == 3
+    assert client.delete(f"/orders/{active}", headers=ADMIN).status_code == 204
+    assert client.get("/product/1/stock").json()["stock"] == 5
+
+
+def test_untracked_stock_is_unlimited(client):
+    assert client.get("/product/3/stock").json()["stock"] is None
+    assert client.post("/orders", headers=USER, json=_order(3, 1000)).status_code == 201
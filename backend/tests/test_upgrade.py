@@ -0,0 +1,66 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.src.utils.money import Money
+from backend.src.utils.upgrade import schema_changes, upgrade_schema
+
+# Таблицы в том виде, в каком их создавала версия до копеек, рейтингов и остатков
+LEGACY_DDL = [
+    "CREATE TABLE countries (id_country INTEGER PRIMARY KEY, name_country VARCHAR(100))",
+    "CREATE TABLE categories (id_category INTEGER PRIMARY KEY, name_category VARCHAR(100))",
+    """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, email VARCHAR NOT NULL,
+        hashed_password VARCHAR NOT NULL, is_active BOOLEAN, role VARCHAR NOT NULL,
+        full_name VARCHAR, address VARCHAR, phone VARCHAR
+    )
+    """,
+    """
+    CREATE TABLE products (
+        id_product INTEGER PRIMARY KEY, name VARCHAR, id_country INTEGER, id_category INTEGER,
+        price_per_unit FLOAT, unit_type VARCHAR(5), expiration_date DATE
+    )
+    """,
+    "CREATE TABLE reviews (id_review INTEGER PRIMARY KEY, id_user INTEGER, id_product INTEGER, rating INTEGER, comment TEXT)",
+    "INSERT INTO products VALUES (1, 'Яблоко', 1, 1, 10.1, 'KG', '2099-01-01')",
+    "INSERT INTO reviews VALUES (1, 2, 1, 5, 'a'), (2, 2, 1, 3, 'b')",
+]
+
+
+async def _upgrade(url: str):
+    engine = create_async_engine(url)
+    try:
+        async with engine.begin() as conn:
+            for statement in LEGACY_DDL:
+                await conn.execute(text(statement))
+        async with engine.begin() as conn:
+            changes = await upgrade_schema(conn)
+        async with engine.connect() as conn:
+            price = await conn.scalar(text("SELECT price_per_unit FROM products"))
+            reviews = (await conn.execute(text("SELECT id_review FROM reviews"))).scalars().all()
+            remaining = await conn.run_sync(schema_changes)
+    finally:
+        await engine.dispose()
+    return changes, price, reviews, remaining
+
+
+def test_legacy_database_is_upgraded(tmp_path):
+    changes, price, reviews, remaining = asyncio.run(_upgrade(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}"))
+
+    assert "рубли -> копейки в price_per_unit" in changes["products"]
+    assert "столбец stock" in changes["products"]
+    assert "ограничение uq_review_user_product" in changes["reviews"]
+    assert changes["sales_daily"] == ["новая таблица"]
+    assert price == 1010
+    assert reviews == [1]
+    assert remaining == {}
+
+
+def test_legacy_rouble_value_is_not_truncated():
+    with pytest.raises(ValueError, match="python -m backend.src.utils.upgrade"):
+        Money().process_result_value(10.1, None)
+    assert Money().process_result_value(1010, None) == Decimal("10.10")
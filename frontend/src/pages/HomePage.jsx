@@ -1,5 +1,5 @@
-import React, {useState, useEffect} from 'react';
-import {Layout, Menu, Spin, Row, Col, Alert} from 'antd';
+import React, {useState, useEffect, useRef} from 'react';
+import {Layout, Menu, Spin, Row, Col, Alert, Button} from 'antd';
 import {AppstoreOutlined} from '@ant-design/icons';
 import Header from '../components/Header';
 import ProductCard from '../components/ProductCard';
@@ -13,9 +13,12 @@ const HomePage = () => {
     const [selectedCategoryId, setSelectedCategoryId] = useState(null);
     const [loadingCategories, setLoadingCategories] = useState(true);
     const [loadingProducts, setLoadingProducts] = useState(false);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [errorCategories, setErrorCategories] = useState('');
     const [errorProducts, setErrorProducts] = useState('');
     const [collapsed, setCollapsed] = useState(false);
+    const currentCategoryRef = useRef(null);
 
     // Загрузка категорий
     useEffect(() => {
@@ -35,24 +38,51 @@ const HomePage = () => {
         fetchCategories();
     }, []);
 
-    // Загрузка продуктов при изменении категории
+    // Загрузка первой страницы продуктов при изменении категории
     useEffect(() => {
+        let cancelled = false;
+        currentCategoryRef.current = selectedCategoryId;
         const fetchProducts = async () => {
             setLoadingProducts(true);
             setErrorProducts('');
+            setNextCursor(null);
             try {
                 const response = await getProductsByCategory(selectedCategoryId);
-                setProducts(response.data);
+                if (cancelled) return;
+                setProducts(response.data.items);
+                setNextCursor(response.data.next_cursor);
             } catch (error) {
+                if (cancelled) return;
                 console.error(`Failed to fetch products for category ${selectedCategoryId}`, error);
                 setErrorProducts('Не удалось загрузить товары.');
             } finally {
-                setLoadingProducts(false);
+                if (!cancelled) setLoadingProducts(false);
             }
         };
         fetchProducts();
+        // Ответ для ранее выбранной категории не должен перезаписать текущий
+        return () => {
+            cancelled = true;
+        };
     }, [selectedCategoryId]);
 
+    // Дозагрузка следующей страницы по курсору
+    const handleLoadMore = async () => {
+        const categoryId = selectedCategoryId;
+        setLoadingMore(true);
+        try {
+            const response = await getProductsByCategory(categoryId, nextCursor);
+            if (currentCategoryRef.current !== categoryId) return;
+            setProducts(prev => [...prev, ...response.data.items]);
+            setNextCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error(`Failed to fetch more products for category ${categoryId}`, error);
+            setErrorProducts('Не удалось загрузить товары.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleMenuClick = (e) => {
         setSelectedCategoryId(e.key === 'all' ? null : parseInt(e.key, 10));
     };
@@ -105,13 +135,22 @@ const HomePage = () => {
                             ) : products.length === 0 ? (
                                 <p className="text-center text-gray-500">Нет товаров в этой категории.</p>
                             ) : (
-                                <Row gutter={[16, 20]}>
-                                    {products.map((product) => (
-                                        <Col key={product.id_product} xs={12} sm={12} md={12} lg={8} xl={6}>
-                                            <ProductCard product={product}/>
-                                        </Col>
-                                    ))}
-                                </Row>
+                                <>
+                                    <Row gutter={[16, 20]}>
+                                        {products.map((product) => (
+                                            <Col key={product.id_product} xs={12} sm={12} md={12} lg={8} xl={6}>
+                                                <ProductCard product={product}/>
+                                            </Col>
+                                        ))}
+                                    </Row>
+                                    {nextCursor && (
+                                        <div className="flex justify-center mt-6">
+                                            <Button onClick={handleLoadMore} loading={loadingMore}>
+                                                Показать еще
+                                            </Button>
+                                        </div>
+                                    )}
+                                </>
                             )}
                         </Content>
                     </div>
@@ -44,13 +44,18 @@ export const getCategories = () => {
     return apiClient.get('/category/all');
 };
 
-export const getAllProducts = () => {
-    return apiClient.get('/product/all');
+// Каталог отдается постранично: следующая страница запрашивается по next_cursor
+export const PRODUCTS_PAGE_SIZE = 40;
+
+export const getAllProducts = (cursor = null) => {
+    return apiClient.get('/product/all', {params: {limit: PRODUCTS_PAGE_SIZE, cursor: cursor || undefined}});
 };
 
-export const getProductsByCategory = (categoryId) => {
-    if (!categoryId) return getAllProducts();
-    return apiClient.get(`/category/${categoryId}/products`);
+export const getProductsByCategory = (categoryId, cursor = null) => {
+    if (!categoryId) return getAllProducts(cursor);
+    return apiClient.get(`/category/${categoryId}/products`, {
+        params: {limit: PRODUCTS_PAGE_SIZE, cursor: cursor || undefined}
+    });
 };
 
 export const getCart = () => {